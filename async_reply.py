@@ -0,0 +1,355 @@
+"""
+异步回复引擎 - 在单个事件循环上通过 HTTP 直接驱动 Discuz 登录与快速回复
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+import discuz_api
+from deadline import Deadline
+
+# 回复时间预算内，发出请求前至少需要剩余的时间（秒）
+MIN_REQUEST_SECONDS = 2
+
+
+class SessionExpired(Exception):
+    """论坛登录状态已失效"""
+
+
+class AccountSession:
+    """单个账户的 HTTP 会话"""
+    def __init__(self, account, user_agent):
+        self.account = account
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': user_agent})
+        self.logged_in = False
+        self.login_lock = asyncio.Lock()
+
+
+class AsyncReplyEngine:
+    def __init__(self, bot):
+        """
+        初始化异步回复引擎
+
+        Args:
+            bot: TimedReplyBot 实例，复用其配置、消息生成与统计
+        """
+        self.bot = bot
+        self.config = bot.config
+        self.logger = bot.logger
+        self.base_url = self.config['forum']['base_url']
+
+        settings = self.config.get('global_settings', {})
+        self.http_timeout = settings.get('http_timeout_seconds', 15)
+        self.max_concurrent_requests = settings.get('max_concurrent_requests', 32)
+        self.user_agent = self.config.get('browser', {}).get(
+            'user_agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+
+        self.sessions = {}  # 存储每个账户的 HTTP 会话
+        self.executor = None
+        self.semaphore = None
+
+    # ------------------------------------------------------------------
+    # 同步 HTTP 操作（在线程池中执行）
+    # ------------------------------------------------------------------
+    def _login_sync(self, account_session):
+        """通过 HTTP 表单登录，返回是否登录成功"""
+        account = account_session.account
+        session = account_session.session
+
+        response = session.get(discuz_api.login_page_url(self.base_url), timeout=self.http_timeout)
+        response.raise_for_status()
+        formhash = discuz_api.parse_formhash(response.text)
+        loginhash = discuz_api.parse_loginhash(response.text)
+        charset = response.encoding or 'utf-8'
+
+        data = {
+            'formhash': formhash or '',
+            'referer': self.base_url,
+            'loginfield': 'username',
+            'username': account['username'].encode(charset, errors='xmlcharrefreplace'),
+            'password': account['password'].encode(charset, errors='xmlcharrefreplace'),
+            'questionid': '0',
+            'answer': '',
+        }
+        response = session.post(
+            discuz_api.login_submit_url(self.base_url, loginhash),
+            data=data,
+            timeout=self.http_timeout
+        )
+        response.raise_for_status()
+        return discuz_api.has_auth_cookie(session.cookies.keys())
+
+    def _request_timeout(self, deadline, stage):
+        """
+        单个请求的超时时间，不超过本次回复的剩余时间
+
+        Raises:
+            DeadlineExceeded: 剩余时间少于 MIN_REQUEST_SECONDS
+        """
+        deadline.require(MIN_REQUEST_SECONDS, stage)
+        return deadline.cap(self.http_timeout)
+
+    def _post_reply_sync(self, account_session, target, message, deadline):
+        """
+        获取帖子页面的 formhash 并提交快速回复，返回 (是否成功, pid, 提示信息)
+
+        Raises:
+            SessionExpired: 登录凭证 cookie 已失效，或页面、响应提示需要登录
+        """
+        session = account_session.session
+
+        response = session.get(target['url'], timeout=self._request_timeout(deadline, '访问帖子'))
+        response.raise_for_status()
+        if not discuz_api.has_auth_cookie(session.cookies.keys()) or discuz_api.is_login_required(response.text):
+            raise SessionExpired('登录状态已失效（帖子页面）')
+        formhash = discuz_api.parse_formhash(response.text)
+        if not formhash:
+            return False, None, '帖子页面中未找到 formhash'
+
+        tid = target.get('tid') or discuz_api.parse_thread_id(target['url'])
+        if not tid:
+            return False, None, '无法从链接中解析帖子 tid'
+        fid = target.get('fid') or discuz_api.parse_forum_id(response.text)
+        charset = response.encoding or 'utf-8'
+
+        response = session.post(
+            discuz_api.reply_submit_url(self.base_url, tid, fid),
+            data=discuz_api.reply_form_data(message, formhash, charset),
+            timeout=self._request_timeout(deadline, '提交回复')
+        )
+        response.raise_for_status()
+
+        if discuz_api.is_reply_success(response.text):
+            return True, discuz_api.parse_post_id(response.text), ''
+        if discuz_api.is_login_required(response.text):
+            raise SessionExpired(f"登录状态已失效: {discuz_api.parse_ajax_message(response.text)}")
+        return False, None, discuz_api.parse_ajax_message(response.text)
+
+    # ------------------------------------------------------------------
+    # 异步调度
+    # ------------------------------------------------------------------
+    async def _call(self, func, *args):
+        """在受限并发下把阻塞调用交给线程池执行"""
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    def _get_session(self, account):
+        """获取（必要时创建）账户的 HTTP 会话"""
+        account_id = account['id']
+        if account_id not in self.sessions:
+            self.sessions[account_id] = AccountSession(account, self.user_agent)
+        return self.sessions[account_id]
+
+    async def login(self, account):
+        """登录账户（同一账户的多个目标只登录一次）"""
+        account_session = self._get_session(account)
+        async with account_session.login_lock:
+            if account_session.logged_in:
+                return True
+            account_id = account['id']
+            self.logger.info(f"账户 {account_id} 开始 HTTP 登录: {account['username']}")
+            try:
+                account_session.logged_in = await self._call(self._login_sync, account_session)
+            except Exception as e:
+                self.logger.error(f"账户 {account_id} HTTP 登录过程错误: {e}")
+                return False
+
+            if account_session.logged_in:
+                self.logger.info(f"账户 {account_id} 登录成功")
+            else:
+                self.logger.error(f"账户 {account_id} 登录失败")
+            return account_session.logged_in
+
+    async def post_reply(self, account, target):
+        """发布回复"""
+        account_id = account['id']
+        account_session = self._get_session(account)
+        message = None
+        started = time.monotonic()
+        deadline = Deadline(self.bot.get_reply_budget())
+        try:
+            message = await self._call(self.bot.get_reply_message, target, account_id, deadline)
+            success, pid, error = await self._call(self._post_reply_sync, account_session, target, message, deadline)
+        except SessionExpired as e:
+            # 下次尝试前重新登录
+            account_session.logged_in = False
+            account_session.session.cookies.clear()
+            success, pid, error = False, None, str(e)
+        except Exception as e:
+            success, pid, error = False, None, str(e)
+
+        latency_ms = (time.monotonic() - started) * 1000
+        await self._call(self.bot.state_store.record_reply,
+                         account_id, target['id'], success, message, pid, latency_ms,
+                         None if success else error)
+
+        if not success:
+            self.bot.record_failure(account_id)
+            self.logger.error(f"账户 {account_id} 发布回复失败: {error}")
+            return False
+
+        total = self.bot.record_reply(account_id, pid)
+        self.logger.info(f"账户 {account_id} 成功发布回复 #{total} (pid: {pid}): {message}")
+        return True
+
+    async def post_reply_with_retry(self, account, target):
+        """发布回复，失败时按配置重试"""
+        attempts, retry_delay = self.bot.get_retry_policy()
+        success = False
+        for attempt in range(1, attempts + 1):
+            # 登录状态失效后重新登录（已登录时直接返回）
+            await self.login(account)
+            if await self.post_reply(account, target):
+                success = True
+                break
+            if attempt < attempts:
+                self.logger.warning(f"账户 {account['id']} 目标 {target['id']} 第 {attempt} 次回复失败，{retry_delay} 秒后重试")
+                if not await self._sleep(retry_delay):
+                    break
+
+        await self._call(self.bot.state_store.record_attempt, account['id'], target['id'], success)
+        return success
+
+    async def _sleep(self, seconds):
+        """可中断的等待，返回 False 表示需要停止"""
+        end = time.monotonic() + seconds
+        while self.bot.running:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, 1))
+        return False
+
+    async def run_account_target(self, account, target):
+        """运行单个账户的单个目标"""
+        account_id = account['id']
+        target_id = target['id']
+        interval_seconds = target['interval_seconds']
+        start_delay = self.bot.get_initial_delay(account_id, target)
+
+        self.logger.info(f"启动账户 {account_id} 的目标 {target_id}，间隔 {interval_seconds} 秒，延迟 {start_delay} 秒")
+
+        if not await self.login(account):
+            self.logger.error(f"账户 {account_id} 登录失败，跳过目标 {target_id}")
+            return
+
+        if start_delay > 0:
+            self.logger.info(f"账户 {account_id} 目标 {target_id} 延迟 {start_delay} 秒后开始")
+            if not await self._sleep(start_delay):
+                return
+
+        while self.bot.running:
+            try:
+                success = await self.post_reply_with_retry(account, target)
+                if not success:
+                    self.logger.error(f"账户 {account_id} 目标 {target_id} 回复失败")
+
+                if not await self._sleep(interval_seconds):
+                    break
+            except Exception as e:
+                self.logger.error(f"账户 {account_id} 目标 {target_id} 运行错误: {e}")
+                await self._sleep(30)  # 出错后等待30秒再重试
+
+    async def _monitor(self):
+        """定期显示统计信息并检查工作时间"""
+        while self.bot.running:
+            if not self.bot.is_within_work_hours():
+                now = datetime.now()
+                self.logger.info(f"到达工作时间结束时间 {now.strftime('%Y-%m-%d %H:%M:%S')}，停止运行")
+                self.bot.running = False
+                break
+            self.bot.display_stats()
+            await asyncio.sleep(10)
+
+    async def _run_all(self):
+        """为每个账户的每个目标创建协程并运行"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_requests,
+            thread_name_prefix='async_reply'
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        tasks = []
+        for account in self.bot.config_manager.get_enabled_accounts():
+            for target in self.bot.config_manager.get_enabled_targets(account):
+                tasks.append(asyncio.create_task(
+                    self.run_account_target(account, target),
+                    name=f"{account['id']}_{target['id']}"
+                ))
+
+        if not tasks:
+            self.logger.error("没有启用的回复目标")
+            return
+
+        self.logger.info(f"异步引擎启动 {len(tasks)} 个回复任务")
+        monitor = asyncio.create_task(self._monitor())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.bot.running = False
+            monitor.cancel()
+
+    async def _run_account_once(self, account):
+        """登录单个账户并对其每个启用的目标依次回复一次"""
+        account_id = account['id']
+        targets = self.bot.config_manager.get_enabled_targets(account)
+        if not targets:
+            return []
+
+        if not await self.login(account):
+            self.logger.error(f"账户 {account_id} 登录失败，跳过 {len(targets)} 个目标")
+            return [(account_id, target['id'], False) for target in targets]
+
+        results = []
+        for target in targets:
+            success = self.bot.running and await self.post_reply_with_retry(account, target)
+            results.append((account_id, target['id'], success))
+        return results
+
+    async def _run_once_all(self):
+        """所有账户并发执行单次回复"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_requests,
+            thread_name_prefix='async_reply'
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        accounts = self.bot.config_manager.get_enabled_accounts()
+        account_results = await asyncio.gather(*(self._run_account_once(account) for account in accounts))
+        return [result for results in account_results for result in results]
+
+    def run_once(self):
+        """同步入口：每个账户登录一次，对每个启用的目标各回复一次"""
+        try:
+            return asyncio.run(self._run_once_all())
+        except KeyboardInterrupt:
+            self.logger.info("收到停止信号")
+            self.bot.running = False
+            return []
+        finally:
+            self.close()
+
+    def close(self):
+        """关闭所有 HTTP 会话与线程池"""
+        for account_id, account_session in self.sessions.items():
+            try:
+                account_session.session.close()
+            except Exception as e:
+                self.logger.error(f"关闭账户 {account_id} 会话时出错: {e}")
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def run(self):
+        """同步入口：在单个事件循环上运行所有回复任务"""
+        try:
+            asyncio.run(self._run_all())
+        except KeyboardInterrupt:
+            self.logger.info("收到停止信号")
+            self.bot.running = False
+        finally:
+            self.close()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回复框填写基准测试
+在本地页面的文本框中分别用 send_keys 和一次脚本调用填写不同长度的中文回复，比较耗时
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from timed_reply import FILL_TEXTAREA_SCRIPT
+
+TEST_PAGE = "data:text/html;charset=utf-8,<textarea id='fastpostmessage'></textarea>"
+SAMPLE_TEXT = "今天给大家分享一个笑话：为什么程序员总是混淆圣诞节和万圣节？因为 Oct 31 == Dec 25！\n"
+
+
+def make_message(length):
+    """生成指定长度的回复内容"""
+    return (SAMPLE_TEXT * (length // len(SAMPLE_TEXT) + 1))[:length]
+
+
+def fill_send_keys(driver, element, message):
+    element.clear()
+    element.send_keys(message)
+
+
+def fill_script(driver, element, message):
+    if not driver.execute_script(FILL_TEXTAREA_SCRIPT, element, message):
+        raise RuntimeError("脚本填写后内容不一致")
+
+
+METHODS = {
+    'send_keys': fill_send_keys,
+    'execute_script': fill_script,
+}
+
+
+def measure(driver, element, method, message, repeat):
+    """重复填写，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        driver.execute_script("arguments[0].value = '';", element)
+        start = time.perf_counter()
+        method(driver, element, message)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回复框填写基准测试')
+    parser.add_argument('--lengths', default='20,100,300,1000', help='回复长度（字符数），用逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='每个场景的重复次数')
+    parser.add_argument('--no-headless', action='store_true', help='显示浏览器窗口')
+    args = parser.parse_args()
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+
+    options = Options()
+    if not args.no_headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+
+    driver = webdriver.Chrome(options=options)
+    try:
+        driver.get(TEST_PAGE)
+        element = driver.find_element(By.ID, 'fastpostmessage')
+
+        print(f"{'长度':>8}" + "".join(f"{name + '(ms)':>20}" for name in METHODS))
+        print("-" * (8 + 20 * len(METHODS)))
+        for length in (int(value) for value in args.lengths.split(',')):
+            message = make_message(length)
+            row = f"{length:>8}"
+            for method in METHODS.values():
+                row += f"{statistics.median(measure(driver, element, method, message, args.repeat)):>20.1f}"
+            print(row)
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
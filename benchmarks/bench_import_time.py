@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准测试
+在全新的解释器中分别测量导入各模块和创建 TimedReplyBot 的耗时
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOKE_STORIES_DIR = os.path.join(ROOT_DIR, 'content', 'joke_stories')
+
+# 每个场景在子进程中执行的代码，输出耗时（秒）
+SCENARIOS = {
+    '解释器空启动': "pass",
+    'import timed_reply': "import timed_reply",
+    'import main': "import main",
+    'TimedReplyBot 初始化': (
+        "from timed_reply import ConfigManager, TimedReplyBot\n"
+        "TimedReplyBot(ConfigManager('config_example.json'))"
+    ),
+    'import joke_generator': (
+        f"import sys; sys.path.append({JOKE_STORIES_DIR!r})\n"
+        "import joke_generator"
+    ),
+}
+
+TIMER_TEMPLATE = """
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(code, repeat):
+    """在新的子进程中重复执行代码，返回每次的耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', TIMER_TEMPLATE.format(code=code)],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True
+        )
+        if output.returncode != 0:
+            return None, output.stderr.strip().splitlines()[-1]
+        timings.append(float(output.stdout.strip().splitlines()[-1]) * 1000)
+    return timings, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景的重复次数')
+    args = parser.parse_args()
+
+    print(f"{'场景':<28}{'中位数(ms)':>12}{'最小(ms)':>12}")
+    print("-" * 52)
+    for name, code in SCENARIOS.items():
+        timings, error = measure(code, args.repeat)
+        if timings is None:
+            print(f"{name:<28}  失败: {error}")
+            continue
+        print(f"{name:<28}{statistics.median(timings):>12.1f}{min(timings):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
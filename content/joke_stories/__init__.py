@@ -5,8 +5,10 @@
 提供笑话搜索和文本生成功能
 """
 
-from .joke_search import JokeSearcher
+from .joke_search import JokeSearcher, get_shared_searcher, get_shared_session
+from .joke_store import JokeStore
 from .joke_generator import JokeGenerator
+from .joke_templates import JokeTemplate
 from .main import JokeStoriesApp
 
 __version__ = "1.0.0"
@@ -15,6 +17,10 @@ __description__ = "笑话故事生成器"
 
 __all__ = [
     'JokeSearcher',
+    'JokeStore',
     'JokeGenerator', 
-    'JokeStoriesApp'
+    'JokeTemplate',
+    'JokeStoriesApp',
+    'get_shared_searcher',
+    'get_shared_session'
 ]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线笑话 API 健康状态
+按 API 记录错误率和响应时间的指数移动平均（EWMA），错误率过高时熔断，
+熔断期间直接跳过该 API，冷却后只放行一个探测请求
+"""
+
+import threading
+import time
+from typing import Callable, Dict
+
+CLOSED = 'closed'        # 正常
+OPEN = 'open'            # 熔断中，直接跳过
+HALF_OPEN = 'half_open'  # 冷却结束，放行一个探测请求
+
+
+class CircuitBreaker:
+    """单个 API 的熔断器（线程安全）"""
+    
+    def __init__(self,
+                 name: str,
+                 error_threshold: float = 0.5,
+                 min_samples: int = 3,
+                 alpha: float = 0.3,
+                 open_seconds: float = 60,
+                 max_open_seconds: float = 600,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: API 名称
+            error_threshold: 错误率 EWMA 达到该值时熔断
+            min_samples: 至少请求过这么多次才会熔断（避免偶发错误）
+            alpha: EWMA 平滑系数，越大越看重最近的请求
+            open_seconds: 熔断后的冷却时间（秒），探测失败时加倍
+            max_open_seconds: 冷却时间上限（秒）
+        """
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.clock = clock
+        
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.error_rate = 0.0
+        self.latency = None  # 响应时间 EWMA（秒）
+        self.samples = 0
+        self.open_seconds = open_seconds
+        self.opened_at = None
+        self.probe_in_flight = False
+    
+    def allow_request(self) -> bool:
+        """是否可以向该 API 发起请求（半开状态下同一时间只放行一个探测请求）"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+    
+    def _update(self, error: float, latency: float):
+        """更新 EWMA，调用方需持有 lock"""
+        self.samples += 1
+        self.error_rate += self.alpha * (error - self.error_rate)
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.alpha * (latency - self.latency)
+    
+    def record_success(self, latency: float):
+        """记录一次成功的请求"""
+        with self.lock:
+            self._update(0.0, latency)
+            if self.state != CLOSED:
+                # 探测成功，恢复正常
+                self.state = CLOSED
+                self.error_rate = 0.0
+                self.open_seconds = self.base_open_seconds
+                self.probe_in_flight = False
+    
+    def record_failure(self, latency: float):
+        """记录一次失败的请求"""
+        with self.lock:
+            self._update(1.0, latency)
+            if self.state == HALF_OPEN:
+                # 探测失败，加倍冷却时间后继续熔断
+                self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+                self._open()
+            elif self.state == CLOSED and self.samples >= self.min_samples \
+                    and self.error_rate >= self.error_threshold:
+                self._open()
+    
+    def record_inconclusive(self):
+        """记录一次无法说明接口健康状况的请求（如因调用方时间预算不足而超时），只释放探测名额"""
+        with self.lock:
+            self.probe_in_flight = False
+    
+    def _open(self):
+        """进入熔断状态，调用方需持有 lock"""
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.probe_in_flight = False
+    
+    def is_open(self) -> bool:
+        """是否处于熔断状态"""
+        with self.lock:
+            return self.state == OPEN
+    
+    def snapshot(self) -> Dict:
+        """获取健康状态快照"""
+        with self.lock:
+            return {
+                'state': self.state,
+                'error_rate': round(self.error_rate, 3),
+                'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+                'samples': self.samples,
+                'open_seconds': self.open_seconds if self.state != CLOSED else 0
+            }
@@ -7,39 +7,74 @@
 
 import json
 import random
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
 import logging
-from joke_search import JokeSearcher
+from joke_search import JokeSearcher, get_shared_searcher
+from joke_templates import BUILTIN_TEMPLATES, JokeTemplate, compile_templates
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 多个笑话之间的分隔符
+JOKE_SEPARATOR = "\n\n" + "="*50 + "\n\n"
+NO_JOKES_MESSAGE = "抱歉，暂时没有找到合适的笑话。"
+
 class JokeGenerator:
     """笑话文本生成器"""
     
-    def __init__(self):
-        self.searcher = JokeSearcher()
+    def __init__(self, templates: Optional[Dict[str, str]] = None, searcher: Optional[JokeSearcher] = None):
+        """
+        Args:
+            templates: 自定义文本模板 {格式名: 模板}，与内置模板合并（同名覆盖）
+            searcher: 笑话搜索器，默认使用进程内共享的搜索器
+        """
+        self.searcher = searcher if searcher is not None else get_shared_searcher()
+        
+        # 文本模板（原始字符串）及其预编译结果
+        self.templates = dict(BUILTIN_TEMPLATES)
+        self._compiled_templates = compile_templates(self.templates)
+        if templates:
+            self.load_templates(templates)
+    
+    def register_template(self, name: str, template: str):
+        """
+        注册文本模板，注册时即校验字段
         
-        # 文本模板
-        self.templates = {
-            'simple': "{content}",
-            'with_title': "{title}\n\n{content}",
-            'with_source': "{content}\n\n—— 来源：{source}",
-            'full_format': "{title}\n\n{content}\n\n—— 来源：{source}",
-            'story_format': "今天给大家分享一个笑话：\n\n{content}\n\n希望大家喜欢！",
-            'forum_post': "【笑话分享】{title}\n\n{content}\n\n#笑话 #分享",
-            'social_media': "😄 今日笑话：\n\n{content}\n\n#笑话 #开心",
-            'email_format': "主题：{title}\n\n内容：\n{content}\n\n祝您开心！",
-            'markdown': "## {title}\n\n{content}\n\n*来源：{source}*"
-        }
+        Raises:
+            ValueError: 模板格式错误或引用了不支持的字段
+        """
+        self._compiled_templates[name] = JokeTemplate(name, template)
+        self.templates[name] = template
+    
+    def load_templates(self, templates: Dict[str, str]):
+        """批量注册自定义模板（先全部校验，任一无效则都不注册）"""
+        compiled = compile_templates(templates)
+        self._compiled_templates.update(compiled)
+        self.templates.update(templates)
+    
+    def _get_template(self, format_type: str) -> JokeTemplate:
+        """获取预编译模板，未知格式使用 simple"""
+        template = self.templates.get(format_type)
+        if template is None:
+            return self._compiled_templates['simple']
+        
+        compiled = self._compiled_templates.get(format_type)
+        if compiled is None or compiled.template != template:
+            # 兼容直接修改 self.templates 的用法
+            try:
+                compiled = JokeTemplate(format_type, template)
+            except ValueError as e:
+                logger.warning(f"模板无效，使用 simple 格式: {e}")
+                return self._compiled_templates['simple']
+            self._compiled_templates[format_type] = compiled
+        return compiled
     
     def generate_joke_text(self, 
                           count: int = 1, 
                           format_type: str = 'simple',
                           category: str = 'any',
-                          include_metadata: bool = False) -> str:
+                          include_metadata: bool = False,
+                          deadline: Optional[float] = None) -> str:
         """
         生成笑话文本
         
@@ -48,67 +83,41 @@ class JokeGenerator:
             format_type: 文本格式类型
             category: 笑话类别
             include_metadata: 是否包含元数据
+            deadline: 截止时间（time.monotonic() 时间戳），到时后只使用本地笑话库
             
         Returns:
             格式化的笑话文本
         """
-        # 根据类别获取笑话
-        if category == 'programming':
-            jokes = self.searcher.search_programming_jokes(count)
-        elif category == 'dad':
-            jokes = self.searcher.search_dad_jokes(count)
-        else:
-            jokes = self.searcher.search_jokes(count, category)
-        
-        if not jokes:
-            return "抱歉，暂时没有找到合适的笑话。"
-        
-        # 生成文本
-        if count == 1:
-            return self._format_single_joke(jokes[0], format_type, include_metadata)
-        else:
-            return self._format_multiple_jokes(jokes, format_type, include_metadata)
+        jokes_text = JOKE_SEPARATOR.join(
+            self.iter_joke_texts(count, format_type, category, include_metadata, deadline)
+        )
+        return jokes_text or NO_JOKES_MESSAGE
     
-    def _format_single_joke(self, joke: Dict, format_type: str, include_metadata: bool) -> str:
-        """格式化单个笑话"""
-        template = self.templates.get(format_type, self.templates['simple'])
-        
-        # 准备格式化数据
-        format_data = {
-            'title': joke.get('title', '笑话'),
-            'content': joke.get('content', ''),
-            'source': joke.get('source', '未知')
-        }
+    def iter_joke_texts(self, 
+                        count: int = 1, 
+                        format_type: str = 'simple',
+                        category: str = 'any',
+                        include_metadata: bool = False,
+                        deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        逐个生成格式化的笑话文本，每获取到一个笑话就立即返回
         
-        # 添加元数据
-        if include_metadata:
-            format_data['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            format_data['category'] = joke.get('category', 'general')
+        参数同 generate_joke_text；多个笑话时标题会加上编号，调用方用 JOKE_SEPARATOR 连接
         
-        # 格式化文本
-        try:
-            formatted_text = template.format(**format_data)
-        except KeyError as e:
-            logger.warning(f"模板格式化失败，缺少字段: {e}")
-            formatted_text = joke.get('content', '')
+        Yields:
+            单个笑话的格式化文本
+        """
+        template = self._get_template(format_type)
         
-        return formatted_text
+        for i, joke in enumerate(self._iter_jokes_by_category(category, count, deadline), 1):
+            if count > 1:
+                # 为多个笑话添加编号
+                joke = dict(joke, title=f"{joke.get('title', '笑话')} ({i})")
+            yield template.render(joke, include_metadata)
     
-    def _format_multiple_jokes(self, jokes: List[Dict], format_type: str, include_metadata: bool) -> str:
-        """格式化多个笑话"""
-        formatted_jokes = []
-        
-        for i, joke in enumerate(jokes, 1):
-            # 为多个笑话添加编号
-            joke_copy = joke.copy()
-            joke_copy['title'] = f"{joke_copy.get('title', '笑话')} ({i})"
-            
-            formatted_joke = self._format_single_joke(joke_copy, format_type, include_metadata)
-            formatted_jokes.append(formatted_joke)
-        
-        # 用分隔符连接多个笑话
-        separator = "\n\n" + "="*50 + "\n\n"
-        return separator.join(formatted_jokes)
+    def _format_single_joke(self, joke: Dict, format_type: str, include_metadata: bool) -> str:
+        """格式化单个笑话"""
+        return self._get_template(format_type).render(joke, include_metadata)
     
     def generate_joke_collection(self, 
                                 categories: List[str] = None,
@@ -125,26 +134,33 @@ class JokeGenerator:
         Returns:
             格式化的笑话合集文本
         """
+        return "\n".join(self.iter_joke_collection(categories, jokes_per_category, format_type))
+    
+    def iter_joke_collection(self, 
+                             categories: List[str] = None,
+                             jokes_per_category: int = 2,
+                             format_type: str = 'full_format') -> Iterator[str]:
+        """
+        逐段生成笑话合集，参数同 generate_joke_collection
+        
+        Yields:
+            合集的各个片段（标题、类别标题、单个笑话），调用方用换行连接
+        """
         if categories is None:
             categories = ['any', 'programming', 'dad']
         
-        collection_parts = []
-        collection_parts.append("🎭 笑话合集\n")
-        collection_parts.append("="*50 + "\n")
+        template = self._get_template(format_type)
+        
+        yield "🎭 笑话合集\n"
+        yield "="*50 + "\n"
         
         for category in categories:
             # 添加类别标题
-            category_title = self._get_category_title(category)
-            collection_parts.append(f"\n## {category_title}\n")
+            yield f"\n## {self._get_category_title(category)}\n"
             
             # 生成该类别的笑话
-            jokes = self._get_jokes_by_category(category, jokes_per_category)
-            
-            for i, joke in enumerate(jokes, 1):
-                joke_text = self._format_single_joke(joke, format_type, False)
-                collection_parts.append(f"{i}. {joke_text}\n")
-        
-        return "\n".join(collection_parts)
+            for i, joke in enumerate(self._iter_jokes_by_category(category, jokes_per_category), 1):
+                yield f"{i}. {template.render(joke)}\n"
     
     def _get_category_title(self, category: str) -> str:
         """获取类别标题"""
@@ -158,12 +174,16 @@ class JokeGenerator:
     
     def _get_jokes_by_category(self, category: str, count: int) -> List[Dict]:
         """根据类别获取笑话"""
+        return list(self._iter_jokes_by_category(category, count))
+    
+    def _iter_jokes_by_category(self, category: str, count: int, deadline: Optional[float] = None) -> Iterator[Dict]:
+        """根据类别逐个获取笑话"""
         if category == 'programming':
-            return self.searcher.search_programming_jokes(count)
+            return iter(self.searcher.search_programming_jokes(count))
         elif category == 'dad':
-            return self.searcher.search_dad_jokes(count)
+            return iter(self.searcher.search_dad_jokes(count))
         else:
-            return self.searcher.search_jokes(count, category)
+            return self.searcher.iter_jokes(count, category, deadline)
     
     def generate_random_joke(self, format_type: str = 'story_format') -> str:
         """生成随机笑话"""
@@ -177,36 +197,65 @@ class JokeGenerator:
             include_metadata=True
         )
     
-    def generate_joke_for_forum(self, category: str = 'any') -> str:
-        """生成适合论坛的笑话帖子"""
-        return self.generate_joke_text(
-            count=1,
-            format_type='forum_post',
-            category=category,
-            include_metadata=False
-        )
+    def fetch_joke(self, category: str = 'any', deadline: Optional[float] = None) -> Optional[Dict]:
+        """获取一个笑话，没有找到时返回 None"""
+        return next(self._iter_jokes_by_category(category, 1, deadline), None)
     
-    def generate_joke_for_social_media(self, category: str = 'any') -> str:
-        """生成适合社交媒体的笑话"""
-        return self.generate_joke_text(
-            count=1,
-            format_type='social_media',
-            category=category,
-            include_metadata=False
-        )
+    def render_joke(self, joke: Dict, format_type: str, include_metadata: bool = False) -> str:
+        """用指定格式渲染已获取的笑话（不会再次请求笑话源）"""
+        return self._format_single_joke(joke, format_type, include_metadata)
     
-    def generate_joke_email(self, category: str = 'any') -> Dict[str, str]:
-        """生成笑话邮件"""
-        joke = self.searcher.search_jokes(1, category)[0]
+    def render_joke_formats(self, joke: Dict, format_types: List[str], include_metadata: bool = False) -> Dict[str, str]:
+        """用同一个笑话渲染多种格式，返回 {格式名: 文本}"""
+        return {
+            format_type: self.render_joke(joke, format_type, include_metadata)
+            for format_type in format_types
+        }
+    
+    def generate_joke_outputs(self, category: str = 'any') -> Dict:
+        """
+        获取一个笑话并同时生成论坛帖子、社交媒体内容和邮件（只请求一次笑话源）
+        
+        Returns:
+            {'forum': 文本, 'social': 文本, 'email': {'subject': ..., 'body': ...}}，
+            没有找到笑话时各项均为提示文本
+        """
+        joke = self.fetch_joke(category)
+        if joke is None:
+            return {
+                'forum': NO_JOKES_MESSAGE,
+                'social': NO_JOKES_MESSAGE,
+                'email': {'subject': "每日一笑", 'body': NO_JOKES_MESSAGE},
+            }
+        return {
+            'forum': self.generate_joke_for_forum(category, joke=joke),
+            'social': self.generate_joke_for_social_media(category, joke=joke),
+            'email': self.generate_joke_email(category, joke=joke),
+        }
+    
+    def generate_joke_for_forum(self, category: str = 'any', joke: Optional[Dict] = None) -> str:
+        """生成适合论坛的笑话帖子（传入 joke 时直接使用，不再获取）"""
+        joke = joke or self.fetch_joke(category)
+        if joke is None:
+            return NO_JOKES_MESSAGE
+        return self.render_joke(joke, 'forum_post')
+    
+    def generate_joke_for_social_media(self, category: str = 'any', joke: Optional[Dict] = None) -> str:
+        """生成适合社交媒体的笑话（传入 joke 时直接使用，不再获取）"""
+        joke = joke or self.fetch_joke(category)
+        if joke is None:
+            return NO_JOKES_MESSAGE
+        return self.render_joke(joke, 'social_media')
+    
+    def generate_joke_email(self, category: str = 'any', joke: Optional[Dict] = None) -> Dict[str, str]:
+        """生成笑话邮件，主题和正文来自同一个笑话（传入 joke 时直接使用，不再获取）"""
+        joke = joke or self.fetch_joke(category)
+        if joke is None:
+            return {'subject': "每日一笑", 'body': NO_JOKES_MESSAGE}
         
         return {
             'subject': f"每日一笑 - {joke.get('title', '笑话')}",
-            'body': self.generate_joke_text(
-                count=1,
-                format_type='email_format',
-                category=category,
-                include_metadata=True
-            )
+            'body': self.render_joke(joke, 'email_format', include_metadata=True)
         }
     
     def get_available_formats(self) -> List[str]:
@@ -234,8 +283,6 @@ class JokeGenerator:
         Returns:
             保存的文件路径
         """
-        jokes_text = self.generate_joke_text(count, format_type, category, True)
-        
         # 添加文件头信息
         header = f"""# 笑话收集
 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -245,16 +292,26 @@ class JokeGenerator:
 
 """
         
-        full_content = header + jokes_text
-        
+        # 边获取边写入，不在内存中拼接完整文本
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+            f.write(header)
+            
+            written = 0
+            for joke_text in self.iter_joke_texts(count, format_type, category, True):
+                if written:
+                    f.write(JOKE_SEPARATOR)
+                f.write(joke_text)
+                written += 1
+            
+            if not written:
+                f.write(NO_JOKES_MESSAGE)
         
         logger.info(f"笑话已保存到文件: {filename}")
         return filename
 
 def main():
     """测试函数"""
+    logging.basicConfig(level=logging.INFO)
     generator = JokeGenerator()
     
     print("=== 生成单个笑话 ===")
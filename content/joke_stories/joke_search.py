@@ -7,23 +7,80 @@
 
 import requests
 import json
-import random
+import threading
 import time
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 import logging
+from requests.adapters import HTTPAdapter
+
+from api_health import CircuitBreaker
+from joke_store import JokeStore, get_default_store
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# 单次 API 请求的超时时间，以及截止时间前至少需要剩余多少秒才发起请求
+API_TIMEOUT = 10
+MIN_REQUEST_SECONDS = 1.0
+# 同一 API 连续请求之间的间隔（避免请求过于频繁）
+API_REQUEST_INTERVAL = 0.5
+
+# 连接池配置：每个主机保持的连接数和缓存的主机数
+HTTP_POOL_MAXSIZE = 10
+HTTP_POOL_CONNECTIONS = 4
+
+_shared_session = None
+_shared_searcher = None
+_shared_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = HTTP_POOL_CONNECTIONS,
+                   pool_maxsize: int = HTTP_POOL_MAXSIZE) -> requests.Session:
+    """创建带连接池的 HTTP 会话（保持长连接，复用 TLS 握手）"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Connection': 'keep-alive'
+    })
+    
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """获取进程内共享的 HTTP 会话"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+
+def get_shared_searcher() -> 'JokeSearcher':
+    """获取进程内共享的笑话搜索器（线程安全）"""
+    global _shared_searcher
+    if _shared_searcher is None:
+        session = get_shared_session()
+        with _shared_lock:
+            if _shared_searcher is None:
+                _shared_searcher = JokeSearcher(session=session)
+    return _shared_searcher
+
+
 class JokeSearcher:
     """笑话搜索器"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, store: Optional[JokeStore] = None, session: Optional[requests.Session] = None):
+        """
+        Args:
+            store: 本地笑话库，默认使用内置笑话库
+            session: HTTP 会话，默认使用进程内共享的会话（复用连接池）
+        """
+        self.session = session if session is not None else get_shared_session()
         
         # 笑话API配置
         self.joke_apis = {
@@ -39,81 +96,135 @@ class JokeSearcher:
             }
         }
         
-        # 本地笑话库（备用）
-        self.local_jokes = [
-            "为什么程序员喜欢用深色主题？因为光明属于bug。",
-            "为什么程序员总是混淆圣诞节和万圣节？因为 Oct 31 == Dec 25！",
-            "一个程序员走进酒吧，点了一杯酒。然后点了第二杯，第三杯... 最后他点了无穷杯。",
-            "为什么程序员喜欢用Git？因为他们总是需要回滚到之前的状态。",
-            "什么是程序员最喜欢的编程语言？Python，因为它没有大括号。",
-            "为什么程序员总是带着伞？因为他们在等待下雨（rain）的时候，实际上是在等待异常（exception）。",
-            "一个程序员对另一个程序员说：'你的代码有bug。'另一个程序员回答：'这不是bug，这是特性！'",
-            "为什么程序员总是把万圣节和圣诞节搞混？因为 Oct 31 == Dec 25！",
-            "什么是程序员最喜欢的饮料？Java！",
-            "为什么程序员总是带着笔记本？因为他们需要记录所有的bug。"
-        ]
-    
-    def search_jokes(self, count: int = 5, category: str = 'any') -> List[Dict]:
+        # 每个 API 的健康状态（错误率过高时熔断，直接跳过）
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.breakers_lock = threading.Lock()
+        
+        # 本地笑话库（备用，进程内共享同一份索引）
+        self.store = store if store is not None else get_default_store()
+    
+    def search_jokes(self, count: int = 5, category: str = 'any', deadline: Optional[float] = None) -> List[Dict]:
         """
         搜索笑话
         
         Args:
             count: 要获取的笑话数量
             category: 笑话类别 ('any', 'programming', 'general', 'dad')
+            deadline: 截止时间（time.monotonic() 时间戳），到时后不再请求在线 API，改用本地笑话库
             
         Returns:
             笑话列表，每个笑话包含title, content, source字段
         """
-        jokes = []
+        return list(self.iter_jokes(count, category, deadline))
+    
+    def iter_jokes(self, count: int = 5, category: str = 'any', deadline: Optional[float] = None) -> Iterator[Dict]:
+        """
+        逐个获取笑话，每拿到一个就立即返回（不等待全部获取完成）
+        
+        Args:
+            count: 要获取的笑话数量
+            category: 笑话类别
+            deadline: 截止时间（time.monotonic() 时间戳），None 表示不限时
+            
+        Yields:
+            笑话字典，包含title, content, source字段
+        """
+        produced = 0
         
-        # 尝试从在线API获取笑话
-        for api_name, api_config in self.joke_apis.items():
+        # 尝试从在线API获取笑话（健康的 API 按响应时间优先）
+        for api_name, api_config in self._ordered_apis():
+            if produced >= count:
+                break
             try:
-                api_jokes = self._fetch_from_api(api_name, api_config, count - len(jokes))
-                jokes.extend(api_jokes)
-                
-                if len(jokes) >= count:
-                    break
-                    
+                for joke in self._iter_from_api(api_name, api_config, count - produced, deadline):
+                    produced += 1
+                    yield joke
             except Exception as e:
                 logger.warning(f"从 {api_name} 获取笑话失败: {e}")
                 continue
         
         # 如果在线API获取的笑话不够，从本地库补充
-        if len(jokes) < count:
-            local_count = count - len(jokes)
-            local_jokes = self._get_local_jokes(local_count)
-            jokes.extend(local_jokes)
-        
-        return jokes[:count]
+        if produced < count:
+            yield from self._get_local_jokes(count - produced)
+    
+    def get_breaker(self, api_name: str) -> CircuitBreaker:
+        """获取（必要时创建）API 的熔断器"""
+        with self.breakers_lock:
+            if api_name not in self.breakers:
+                self.breakers[api_name] = CircuitBreaker(api_name)
+            return self.breakers[api_name]
+    
+    def _ordered_apis(self) -> List:
+        """按健康状态排序 API：未熔断的在前，其中错误率低、响应时间短的在前"""
+        def sort_key(item):
+            health = self.get_breaker(item[0]).snapshot()
+            latency = health['latency_ms']
+            return (health['state'] != 'closed', health['error_rate'], latency if latency is not None else 0)
+        return sorted(self.joke_apis.items(), key=sort_key)
     
-    def _fetch_from_api(self, api_name: str, api_config: Dict, count: int) -> List[Dict]:
+    def get_api_health(self) -> Dict[str, Dict]:
+        """获取各 API 的健康状态（状态、错误率、平均响应时间）"""
+        return {api_name: self.get_breaker(api_name).snapshot() for api_name in self.joke_apis}
+    
+    def _fetch_from_api(self, api_name: str, api_config: Dict, count: int,
+                        deadline: Optional[float] = None) -> List[Dict]:
         """从指定API获取笑话"""
-        jokes = []
+        return list(self._iter_from_api(api_name, api_config, count, deadline))
+    
+    def _iter_from_api(self, api_name: str, api_config: Dict, count: int,
+                       deadline: Optional[float] = None) -> Iterator[Dict]:
+        """
+        从指定API逐个获取笑话
+        
+        请求超时不超过截止时间，剩余时间不足时停止请求；API 熔断时直接跳过。
+        """
+        breaker = self.get_breaker(api_name)
         
-        for _ in range(count):
+        for i in range(count):
+            if i > 0:
+                # 避免请求过于频繁
+                time.sleep(API_REQUEST_INTERVAL)
+            
+            timeout = API_TIMEOUT
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining < MIN_REQUEST_SECONDS:
+                    logger.info(f"剩余时间不足，停止从 {api_name} 获取笑话")
+                    return
+                timeout = min(timeout, remaining)
+            
+            if not breaker.allow_request():
+                logger.info(f"{api_name} 已熔断，跳过")
+                return
+            
+            started = time.monotonic()
             try:
                 response = self.session.get(
                     api_config['url'], 
                     headers=api_config['headers'],
-                    timeout=10
+                    timeout=timeout
                 )
                 response.raise_for_status()
                 
                 joke_data = response.json()
-                parsed_joke = api_config['parse_func'](joke_data)
-                
-                if parsed_joke:
-                    jokes.append(parsed_joke)
-                
-                # 避免请求过于频繁
-                time.sleep(0.5)
-                
             except Exception as e:
+                if timeout < API_TIMEOUT and isinstance(e, requests.exceptions.Timeout):
+                    # 超时是因为剩余时间不足而缩短了等待，不代表接口不健康
+                    breaker.record_inconclusive()
+                    logger.info(f"{api_name} 未在剩余时间 {timeout:.1f} 秒内响应，停止获取")
+                    return
+                breaker.record_failure(time.monotonic() - started)
                 logger.warning(f"从 {api_name} 获取单个笑话失败: {e}")
+                if breaker.is_open():
+                    logger.warning(f"{api_name} 错误率过高，暂停请求 {breaker.open_seconds:.0f} 秒")
+                    return
                 continue
-        
-        return jokes
+            
+            breaker.record_success(time.monotonic() - started)
+            parsed_joke = api_config['parse_func'](joke_data)
+            
+            if parsed_joke:
+                yield parsed_joke
     
     def _parse_icanhazdadjoke(self, data: Dict) -> Optional[Dict]:
         """解析icanhazdadjoke API响应"""
@@ -148,72 +259,34 @@ class JokeSearcher:
     
     def _get_local_jokes(self, count: int) -> List[Dict]:
         """从本地笑话库获取笑话"""
-        selected_jokes = random.sample(self.local_jokes, min(count, len(self.local_jokes)))
-        
-        return [
-            {
-                'title': '本地笑话',
-                'content': joke,
-                'source': 'local_database'
-            }
-            for joke in selected_jokes
-        ]
+        return self.store.sample('local', count)
     
     def search_programming_jokes(self, count: int = 5) -> List[Dict]:
         """专门搜索编程相关的笑话"""
-        programming_jokes = [
-            "为什么程序员总是带着伞？因为他们在等待下雨（rain）的时候，实际上是在等待异常（exception）。",
-            "什么是程序员最喜欢的编程语言？Python，因为它没有大括号。",
-            "一个程序员对另一个程序员说：'你的代码有bug。'另一个程序员回答：'这不是bug，这是特性！'",
-            "为什么程序员喜欢用深色主题？因为光明属于bug。",
-            "为什么程序员总是混淆圣诞节和万圣节？因为 Oct 31 == Dec 25！",
-            "什么是程序员最喜欢的饮料？Java！",
-            "为什么程序员总是带着笔记本？因为他们需要记录所有的bug。",
-            "一个程序员走进酒吧，点了一杯酒。然后点了第二杯，第三杯... 最后他点了无穷杯。",
-            "为什么程序员喜欢用Git？因为他们总是需要回滚到之前的状态。",
-            "什么是程序员最害怕的事情？没有网络连接。"
-        ]
-        
-        selected_jokes = random.sample(programming_jokes, min(count, len(programming_jokes)))
-        
-        return [
-            {
-                'title': '编程笑话',
-                'content': joke,
-                'source': 'programming_jokes'
-            }
-            for joke in selected_jokes
-        ]
+        return self.store.sample('programming', count)
     
     def search_dad_jokes(self, count: int = 5) -> List[Dict]:
         """搜索爸爸笑话"""
-        dad_jokes = [
-            "为什么鸡要过马路？为了证明它不是胆小鬼！",
-            "什么是世界上最快的动物？猎豹！不，是光速！",
-            "为什么数学书总是很伤心？因为它有太多问题。",
-            "什么是世界上最长的单词？微笑，因为它有两英里长！",
-            "为什么鱼不能玩扑克？因为它们总是被抓住！",
-            "什么是世界上最冷的动物？企鹅！",
-            "为什么鸟总是很累？因为它们总是飞得很高！",
-            "什么是世界上最聪明的动物？人类！不，是海豚！",
-            "为什么狗总是很饿？因为它们总是摇尾巴！",
-            "什么是世界上最勇敢的动物？狮子！不，是老鼠！"
-        ]
-        
-        selected_jokes = random.sample(dad_jokes, min(count, len(dad_jokes)))
+        return self.store.sample('dad', count)
+    
+    def search_by_keyword(self, keyword: str, count: Optional[int] = None, category: str = 'any') -> List[Dict]:
+        """
+        在本地笑话库中按关键词搜索
         
-        return [
-            {
-                'title': '爸爸笑话',
-                'content': joke,
-                'source': 'dad_jokes'
-            }
-            for joke in selected_jokes
-        ]
+        Args:
+            keyword: 关键词，多个关键词用空格分隔（需全部匹配）
+            count: 最多返回的数量，None 表示不限
+            category: 笑话类别，'any' 表示全部类别
+            
+        Returns:
+            匹配的笑话列表
+        """
+        return self.store.search(keyword, category=None if category == 'any' else category, limit=count)
 
 def main():
     """测试函数"""
-    searcher = JokeSearcher()
+    logging.basicConfig(level=logging.INFO)
+    searcher = get_shared_searcher()
     
     print("=== 搜索一般笑话 ===")
     jokes = searcher.search_jokes(count=3)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地笑话库
+启动时构建一次：按类别保存笑话 ID 列表用于随机抽取，并对内容建立倒排索引
+（英文按单词，中文按单字和相邻两字）用于关键词搜索
+"""
+
+import random
+import re
+import sys
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+# 本地笑话库（在线 API 不可用时的备用）
+LOCAL_JOKES = (
+    "为什么程序员喜欢用深色主题？因为光明属于bug。",
+    "为什么程序员总是混淆圣诞节和万圣节？因为 Oct 31 == Dec 25！",
+    "一个程序员走进酒吧，点了一杯酒。然后点了第二杯，第三杯... 最后他点了无穷杯。",
+    "为什么程序员喜欢用Git？因为他们总是需要回滚到之前的状态。",
+    "什么是程序员最喜欢的编程语言？Python，因为它没有大括号。",
+    "为什么程序员总是带着伞？因为他们在等待下雨（rain）的时候，实际上是在等待异常（exception）。",
+    "一个程序员对另一个程序员说：'你的代码有bug。'另一个程序员回答：'这不是bug，这是特性！'",
+    "为什么程序员总是把万圣节和圣诞节搞混？因为 Oct 31 == Dec 25！",
+    "什么是程序员最喜欢的饮料？Java！",
+    "为什么程序员总是带着笔记本？因为他们需要记录所有的bug。",
+)
+
+PROGRAMMING_JOKES = (
+    "为什么程序员总是带着伞？因为他们在等待下雨（rain）的时候，实际上是在等待异常（exception）。",
+    "什么是程序员最喜欢的编程语言？Python，因为它没有大括号。",
+    "一个程序员对另一个程序员说：'你的代码有bug。'另一个程序员回答：'这不是bug，这是特性！'",
+    "为什么程序员喜欢用深色主题？因为光明属于bug。",
+    "为什么程序员总是混淆圣诞节和万圣节？因为 Oct 31 == Dec 25！",
+    "什么是程序员最喜欢的饮料？Java！",
+    "为什么程序员总是带着笔记本？因为他们需要记录所有的bug。",
+    "一个程序员走进酒吧，点了一杯酒。然后点了第二杯，第三杯... 最后他点了无穷杯。",
+    "为什么程序员喜欢用Git？因为他们总是需要回滚到之前的状态。",
+    "什么是程序员最害怕的事情？没有网络连接。",
+)
+
+DAD_JOKES = (
+    "为什么鸡要过马路？为了证明它不是胆小鬼！",
+    "什么是世界上最快的动物？猎豹！不，是光速！",
+    "为什么数学书总是很伤心？因为它有太多问题。",
+    "什么是世界上最长的单词？微笑，因为它有两英里长！",
+    "为什么鱼不能玩扑克？因为它们总是被抓住！",
+    "什么是世界上最冷的动物？企鹅！",
+    "为什么鸟总是很累？因为它们总是飞得很高！",
+    "什么是世界上最聪明的动物？人类！不，是海豚！",
+    "为什么狗总是很饿？因为它们总是摇尾巴！",
+    "什么是世界上最勇敢的动物？狮子！不，是老鼠！",
+)
+
+# 内置类别: 类别名 -> (标题, 来源, 笑话内容)
+BUILTIN_CATEGORIES = {
+    'local': ('本地笑话', 'local_database', LOCAL_JOKES),
+    'programming': ('编程笑话', 'programming_jokes', PROGRAMMING_JOKES),
+    'dad': ('爸爸笑话', 'dad_jokes', DAD_JOKES),
+}
+
+# 英文/数字按单词切分，连续的中文字符作为一段再切分为单字和相邻两字
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+')
+
+
+def tokenize(text: str) -> Set[str]:
+    """切分文本，返回建立索引用的词元集合"""
+    tokens = set()
+    for run in TOKEN_PATTERN.findall(text.lower()):
+        if run.isascii():
+            tokens.add(run)
+        else:
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_tokens(term: str) -> Set[str]:
+    """切分查询词：中文只取相邻两字（单个字时取单字），缩小候选集合"""
+    tokens = set()
+    for run in TOKEN_PATTERN.findall(term.lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class JokeStore:
+    """内存笑话库（构建完成后只读，可在多个线程间共享）"""
+    
+    def __init__(self, categories: Optional[Dict] = None):
+        """
+        Args:
+            categories: {类别名: (标题, 来源, 笑话内容列表)}，默认使用内置类别
+        """
+        self.jokes: List[Dict] = []
+        self._lowered: List[str] = []
+        self.categories: Dict[str, List[int]] = {}
+        self.index: Dict[str, FrozenSet[int]] = {}
+        
+        postings: Dict[str, Set[int]] = {}
+        for category, (title, source, contents) in (categories or BUILTIN_CATEGORIES).items():
+            for content in contents:
+                joke_id = self._add(category, title, source, content)
+                for token in tokenize(content):
+                    postings.setdefault(token, set()).add(joke_id)
+        
+        self.index = {token: frozenset(ids) for token, ids in postings.items()}
+    
+    def _add(self, category: str, title: str, source: str, content: str) -> int:
+        """添加一个笑话，返回其 ID"""
+        joke_id = len(self.jokes)
+        self.jokes.append({
+            'title': sys.intern(title),
+            'content': sys.intern(content),
+            'source': sys.intern(source)
+        })
+        self._lowered.append(content.lower())
+        self.categories.setdefault(sys.intern(category), []).append(joke_id)
+        return joke_id
+    
+    def get_categories(self) -> List[str]:
+        """获取所有类别"""
+        return list(self.categories)
+    
+    def _copy(self, joke_ids: Iterable[int]) -> List[Dict]:
+        """返回笑话副本，调用方修改不会影响笑话库"""
+        return [dict(self.jokes[joke_id]) for joke_id in joke_ids]
+    
+    def sample(self, category: str, count: int) -> List[Dict]:
+        """从指定类别随机抽取不重复的笑话，类别不存在时返回空列表"""
+        joke_ids = self.categories.get(category, [])
+        return self._copy(random.sample(joke_ids, min(count, len(joke_ids))))
+    
+    def search(self, keyword: str, category: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        按关键词搜索笑话
+        
+        Args:
+            keyword: 关键词，多个关键词用空格分隔（需全部匹配）；英文按整词匹配，中文按子串匹配
+            category: 只在指定类别中搜索，None 表示全部类别
+            limit: 最多返回的数量，None 表示不限
+            
+        Returns:
+            匹配的笑话列表（内容相同的笑话只返回一次）
+        """
+        terms = [term for term in keyword.lower().split() if query_tokens(term)]
+        candidates = None
+        for term in terms:
+            for token in query_tokens(term):
+                ids = self.index.get(token, frozenset())
+                candidates = ids if candidates is None else candidates & ids
+        if not candidates:
+            return []
+        
+        if category is not None:
+            candidates = candidates & frozenset(self.categories.get(category, ()))
+        
+        matched, seen = [], set()
+        for joke_id in sorted(candidates):
+            lowered = self._lowered[joke_id]
+            # 倒排索引只保证词元都出现，这里再确认关键词本身是连续出现的
+            if lowered in seen or not all(term in lowered for term in terms):
+                continue
+            seen.add(lowered)
+            matched.append(joke_id)
+            if limit is not None and len(matched) >= limit:
+                break
+        
+        return self._copy(matched)
+    
+    def __len__(self):
+        return len(self.jokes)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> JokeStore:
+    """获取内置笑话库（进程内只构建一次）"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = JokeStore()
+    return _default_store
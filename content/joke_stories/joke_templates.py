@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+笑话文本模板
+在注册时校验并预编译模板，渲染时只计算模板中用到的字段
+"""
+
+from string import Formatter
+from datetime import datetime
+from typing import Dict, Optional
+
+# 内置文本模板
+BUILTIN_TEMPLATES = {
+    'simple': "{content}",
+    'with_title': "{title}\n\n{content}",
+    'with_source': "{content}\n\n—— 来源：{source}",
+    'full_format': "{title}\n\n{content}\n\n—— 来源：{source}",
+    'story_format': "今天给大家分享一个笑话：\n\n{content}\n\n希望大家喜欢！",
+    'forum_post': "【笑话分享】{title}\n\n{content}\n\n#笑话 #分享",
+    'social_media': "😄 今日笑话：\n\n{content}\n\n#笑话 #开心",
+    'email_format': "主题：{title}\n\n内容：\n{content}\n\n祝您开心！",
+    'markdown': "## {title}\n\n{content}\n\n*来源：{source}*"
+}
+
+# 模板可用字段：基本字段总是有值，元数据字段仅在 include_metadata 时填充，否则为空
+BASIC_FIELDS = ('title', 'content', 'source')
+METADATA_FIELDS = ('timestamp', 'category')
+TEMPLATE_FIELDS = BASIC_FIELDS + METADATA_FIELDS
+
+
+_FORMATTER = Formatter()
+
+
+class JokeTemplate:
+    """预编译的笑话模板：文本片段和字段交替排列，渲染时只做拼接"""
+
+    def __init__(self, name: str, template: str):
+        """
+        编译并校验模板
+
+        Raises:
+            ValueError: 模板语法错误或引用了不支持的字段
+        """
+        self.name = name
+        self.template = template
+
+        try:
+            parsed = list(Formatter().parse(template))
+        except ValueError as e:
+            raise ValueError(f"模板 {name} 格式错误: {e}")
+
+        # (文本, 字段名, 转换标志, 格式说明)，字段名为 None 表示只有文本
+        self.parts = []
+        fields = set()
+        for literal, field_name, format_spec, conversion in parsed:
+            if field_name is not None:
+                if field_name not in TEMPLATE_FIELDS:
+                    raise ValueError(
+                        f"模板 {name} 引用了不支持的字段 {{{field_name}}}，可用字段: {', '.join(TEMPLATE_FIELDS)}"
+                    )
+                if '{' in (format_spec or ''):
+                    raise ValueError(f"模板 {name} 不支持嵌套的格式说明: {{{field_name}:{format_spec}}}")
+                fields.add(field_name)
+            self.parts.append((literal, field_name, conversion, format_spec))
+
+        self.fields = tuple(sorted(fields))
+
+    def render(self, joke: Dict, include_metadata: bool = False, now: Optional[datetime] = None) -> str:
+        """渲染单个笑话"""
+        values = {}
+        for field in self.fields:
+            if field == 'title':
+                values[field] = joke.get('title', '笑话')
+            elif field == 'content':
+                values[field] = joke.get('content', '')
+            elif field == 'source':
+                values[field] = joke.get('source', '未知')
+            elif not include_metadata:
+                values[field] = ''
+            elif field == 'timestamp':
+                values[field] = (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                values[field] = joke.get('category', 'general')
+
+        pieces = []
+        for literal, field, conversion, format_spec in self.parts:
+            if literal:
+                pieces.append(literal)
+            if field is None:
+                continue
+            value = values[field]
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            pieces.append(format(value, format_spec) if format_spec else str(value))
+        return ''.join(pieces)
+
+
+def compile_templates(templates: Dict[str, str]) -> Dict[str, JokeTemplate]:
+    """批量编译模板，任一模板无效时抛出 ValueError"""
+    return {name: JokeTemplate(name, template) for name, template in templates.items()}
@@ -16,22 +16,18 @@ from datetime import datetime
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from joke_search import JokeSearcher
+from joke_search import get_shared_searcher
 from joke_generator import JokeGenerator
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class JokeStoriesApp:
     """笑话故事应用程序"""
     
     def __init__(self):
-        self.searcher = JokeSearcher()
-        self.generator = JokeGenerator()
+        # 搜索器和生成器共用同一个搜索器（及其 HTTP 连接池）
+        self.searcher = get_shared_searcher()
+        self.generator = JokeGenerator(searcher=self.searcher)
     
     def run_cli(self, args):
         """运行命令行界面"""
@@ -61,14 +57,18 @@ class JokeStoriesApp:
     
     def _handle_search_command(self, args):
         """处理搜索命令"""
-        print(f"正在搜索 {args.count} 个 {args.category} 笑话...")
-        
-        if args.category == 'programming':
-            jokes = self.searcher.search_programming_jokes(args.count)
-        elif args.category == 'dad':
-            jokes = self.searcher.search_dad_jokes(args.count)
+        if args.keyword:
+            print(f"正在搜索包含 \"{args.keyword}\" 的 {args.category} 笑话...")
+            jokes = self.searcher.search_by_keyword(args.keyword, args.count, args.category)
         else:
-            jokes = self.searcher.search_jokes(args.count, args.category)
+            print(f"正在搜索 {args.count} 个 {args.category} 笑话...")
+            
+            if args.category == 'programming':
+                jokes = self.searcher.search_programming_jokes(args.count)
+            elif args.category == 'dad':
+                jokes = self.searcher.search_dad_jokes(args.count)
+            else:
+                jokes = self.searcher.search_jokes(args.count, args.category)
         
         if not jokes:
             print("没有找到笑话")
@@ -169,6 +169,7 @@ class JokeStoriesApp:
         return {
             'available_formats': self.generator.get_available_formats(),
             'available_categories': self.generator.get_available_categories(),
+            'api_health': self.searcher.get_api_health(),
             'version': '1.0.0',
             'description': '笑话故事生成器API'
         }
@@ -181,6 +182,7 @@ def create_parser():
         epilog="""
 示例用法:
   python main.py search --count 5 --category programming
+  python main.py search --keyword 程序员
   python main.py generate --count 3 --format full_format
   python main.py random --format story_format
   python main.py forum --category dad
@@ -198,6 +200,7 @@ def create_parser():
     search_parser.add_argument('--count', type=int, default=5, help='笑话数量')
     search_parser.add_argument('--category', choices=['any', 'programming', 'dad'], 
                               default='any', help='笑话类别')
+    search_parser.add_argument('--keyword', help='按关键词搜索本地笑话库（多个关键词用空格分隔）')
     
     # 生成命令
     generate_parser = subparsers.add_parser('generate', help='生成笑话文本')
@@ -244,6 +247,12 @@ def create_parser():
 
 def main():
     """主函数"""
+    # 配置日志（只在作为命令行程序运行时配置，导入时不修改全局日志设置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     parser = create_parser()
     args = parser.parse_args()
     
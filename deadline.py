@@ -0,0 +1,44 @@
+"""
+单次回复的时间预算 - 生成回复内容、加载页面、提交和确认各阶段共用一个截止时间
+"""
+import math
+import time
+
+
+class DeadlineExceeded(Exception):
+    """剩余时间不足以完成当前阶段"""
+
+
+class Deadline:
+    """截止时间（基于 time.monotonic），seconds 为 0 或 None 时不限时"""
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """剩余秒数（不限时返回 inf，已超时返回 0）"""
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cap(self, timeout):
+        """把某个阶段的超时时间限制在剩余时间之内"""
+        return min(timeout, self.remaining())
+
+    def require(self, seconds, stage):
+        """
+        确认剩余时间足够完成某个阶段
+
+        Raises:
+            DeadlineExceeded: 剩余时间少于 seconds
+        """
+        remaining = self.remaining()
+        if remaining < seconds:
+            raise DeadlineExceeded(f"回复时间预算不足，放弃{stage}（剩余 {remaining:.1f} 秒）")
+
+    def sleep(self, seconds):
+        """等待，但不超过截止时间"""
+        time.sleep(self.cap(seconds))
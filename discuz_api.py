@@ -0,0 +1,121 @@
+"""
+Discuz 论坛接口辅助函数 - URL 构造与响应解析
+"""
+import re
+import time
+from urllib.parse import urlparse, parse_qs
+
+FORMHASH_PATTERNS = [
+    re.compile(r'name="formhash"\s+value="([0-9a-zA-Z]+)"'),
+    re.compile(r'formhash=([0-9a-zA-Z]{8})'),
+]
+LOGINHASH_PATTERN = re.compile(r'loginhash=([0-9a-zA-Z]+)')
+FORUM_ID_PATTERN = re.compile(r'[?&;]fid=(\d+)')
+THREAD_REWRITE_PATTERN = re.compile(r'thread-(\d+)-')
+POST_ID_PATTERNS = [
+    re.compile(r'[?&;]pid=(\d+)'),
+    re.compile(r"'pid'\s*:\s*'?(\d+)"),
+    re.compile(r'#pid(\d+)'),
+]
+AJAX_MESSAGE_PATTERN = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.S)
+# 未登录时页面或响应中的提示（"您需要先登录才能继续本操作"、"您需要登录后才可以回帖"）
+LOGIN_REQUIRED_MARKERS = ('需要先登录', '需要登录后才可以', '请先登录')
+
+
+def login_page_url(base_url):
+    """登录页面地址"""
+    return f"{base_url}/member.php?mod=logging&action=login"
+
+
+def login_submit_url(base_url, loginhash=None):
+    """登录表单提交地址"""
+    url = f"{base_url}/member.php?mod=logging&action=login&loginsubmit=yes&inajax=1"
+    if loginhash:
+        url += f"&loginhash={loginhash}"
+    return url
+
+
+def reply_submit_url(base_url, tid, fid=None):
+    """快速回复提交地址"""
+    url = f"{base_url}/forum.php?mod=post&action=reply&tid={tid}&extra=&replysubmit=yes&infloat=yes&handlekey=fastpost&inajax=1"
+    if fid:
+        url += f"&fid={fid}"
+    return url
+
+
+def thread_last_page_url(base_url, tid):
+    """帖子最后一页的地址（论坛跳转到最新回复所在的页面）"""
+    return f"{base_url}/forum.php?mod=redirect&tid={tid}&goto=lastpost"
+
+
+def reply_form_data(message, formhash, charset='utf-8'):
+    """快速回复的表单字段（回复内容按论坛页面编码，无法编码的字符转为 HTML 实体）"""
+    return {
+        'message': message.encode(charset, errors='xmlcharrefreplace'),
+        'formhash': formhash,
+        'posttime': str(int(time.time())),
+        'usesig': '1',
+        'subject': '',
+    }
+
+
+def parse_formhash(html):
+    """从页面中解析 formhash"""
+    for pattern in FORMHASH_PATTERNS:
+        match = pattern.search(html or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def parse_loginhash(html):
+    """从登录页面中解析 loginhash"""
+    match = LOGINHASH_PATTERN.search(html or '')
+    return match.group(1) if match else None
+
+
+def parse_thread_id(url):
+    """从帖子链接中解析 tid（支持动态链接和伪静态链接）"""
+    query = parse_qs(urlparse(url).query)
+    if query.get('tid'):
+        return query['tid'][0]
+    match = THREAD_REWRITE_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def parse_forum_id(html):
+    """从帖子页面中解析 fid"""
+    match = FORUM_ID_PATTERN.search(html or '')
+    return match.group(1) if match else None
+
+
+def parse_post_id(text):
+    """从回复响应或跳转地址中解析新帖子的 pid"""
+    for pattern in POST_ID_PATTERNS:
+        match = pattern.search(text or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def is_reply_success(text):
+    """判断快速回复的 AJAX 响应是否成功"""
+    return 'succeedhandle_' in (text or '')
+
+
+def parse_ajax_message(text):
+    """提取 AJAX 响应中的提示文本"""
+    match = AJAX_MESSAGE_PATTERN.search(text or '')
+    if not match:
+        return (text or '').strip()[:200]
+    return re.sub(r'<[^>]+>', '', match.group(1)).strip()[:200]
+
+
+def has_auth_cookie(cookie_names):
+    """检查是否存在 Discuz 登录凭证 cookie（形如 xxxx_auth）"""
+    return any(name == 'auth' or name.endswith('_auth') for name in cookie_names)
+
+
+def is_login_required(text):
+    """判断页面或 AJAX 响应是否提示需要登录（登录状态已失效）"""
+    return any(marker in (text or '') for marker in LOGIN_REQUIRED_MARKERS)
@@ -0,0 +1,148 @@
+"""
+浏览器驱动健康检查 - 统计浏览器进程树的内存占用（用于判断是否需要回收驱动），
+以及检测超出时间预算的卡死操作
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，未安装时不按内存占用回收
+    psutil = None
+
+
+def is_rss_available():
+    """是否可以统计进程内存占用"""
+    return psutil is not None
+
+
+def get_driver_pid(driver):
+    """获取 chromedriver 进程的 pid，无法获取时返回 None"""
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    return getattr(process, 'pid', None)
+
+
+def process_tree_rss(pid):
+    """统计进程及其所有子进程（浏览器、GPU、渲染进程）的常驻内存，单位字节"""
+    if psutil is None or pid is None:
+        return None
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue  # 统计过程中退出的子进程
+    return total
+
+
+def driver_rss(driver):
+    """统计浏览器驱动整个进程树的常驻内存，单位字节，无法统计时返回 None"""
+    return process_tree_rss(get_driver_pid(driver))
+
+
+def _quit_quietly(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def force_quit(driver, timeout=10):
+    """关闭浏览器驱动；quit 本身也卡住时直接结束 chromedriver 及其子进程"""
+    thread = threading.Thread(target=_quit_quietly, args=(driver,), name='force_quit')
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    if not thread.is_alive():
+        return
+
+    pid = get_driver_pid(driver)
+    if psutil is not None and pid is not None:
+        try:
+            root = psutil.Process(pid)
+            for process in root.children(recursive=True) + [root]:
+                try:
+                    process.kill()
+                except psutil.Error:
+                    continue
+        except psutil.Error:
+            pass
+        return
+
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if process is not None:
+        process.kill()
+
+
+class Watchdog:
+    """
+    卡死检测：登记正在进行的操作及其时间预算，超时后在后台线程中调用
+    on_timeout(key, description)，每个操作只触发一次
+    """
+    def __init__(self, on_timeout, check_interval=1):
+        self.on_timeout = on_timeout
+        self.check_interval = check_interval
+        self.operations = {}  # 操作编号 -> (key, 描述, 截止时间)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._tokens = itertools.count()
+
+    def start(self):
+        """启动后台检测线程（重复调用无副作用）"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name='driver_watchdog')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        """停止后台检测线程"""
+        self.stop_event.set()
+
+    @contextmanager
+    def watch(self, key, budget, description):
+        """
+        在时间预算内执行一段操作
+
+        Args:
+            key: 操作所属对象（如账户 ID），传给超时回调
+            budget: 时间预算（秒），0 或 None 表示不检测
+            description: 操作描述，用于日志
+        """
+        if not budget:
+            yield
+            return
+
+        token = next(self._tokens)
+        with self.lock:
+            self.operations[token] = (key, description, time.monotonic() + budget)
+        self.start()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.operations.pop(token, None)
+
+    def _run(self):
+        while not self.stop_event.wait(self.check_interval):
+            now = time.monotonic()
+            with self.lock:
+                expired = [token for token, (_, _, deadline) in self.operations.items() if deadline <= now]
+                expired = [self.operations.pop(token) for token in expired]
+            for key, description, _ in expired:
+                try:
+                    self.on_timeout(key, description)
+                except Exception:
+                    pass  # 回调失败不影响继续检测其他操作
@@ -0,0 +1,103 @@
+"""
+WebDriver 命令统计 - 包装浏览器驱动的 execute，按 (账户, 阶段) 统计各类命令的次数和往返耗时
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# 阶段名称（用于显示）
+PHASE_NAMES = {
+    'login': '登录',
+    'reply': '回复',
+    'recycle': '回收',
+    'other': '其他',
+}
+
+
+class CommandMetrics:
+    """
+    WebDriver 命令统计（线程安全）
+
+    selenium 的所有命令（包括 WebElement 上的操作和 WebDriverWait 的轮询）最终都经过
+    driver.execute，包装它即可统计每条命令的往返耗时。当前阶段保存在线程局部变量中，
+    同一浏览器同一时间只被持有账户锁的线程操作，所以命令可以准确归属到账户和阶段。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.operations = {}  # (账户 ID, 阶段) -> 进入该阶段的次数
+        self.commands = {}  # (账户 ID, 阶段) -> {命令: [次数, 累计秒数]}
+
+    @contextmanager
+    def phase(self, account_id, phase):
+        """在代码块内把当前线程发出的命令归属到指定账户和阶段"""
+        previous = getattr(self.local, 'context', None)
+        key = (account_id, phase)
+        self.local.context = key
+        with self.lock:
+            self.operations[key] = self.operations.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self.local.context = previous
+
+    def record(self, command, seconds):
+        """记录一条命令"""
+        key = getattr(self.local, 'context', None) or (None, 'other')
+        with self.lock:
+            entry = self.commands.setdefault(key, {}).setdefault(command, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def instrument(self, driver):
+        """包装驱动的 execute 方法，返回同一个驱动"""
+        execute = driver.execute
+
+        def timed_execute(driver_command, params=None):
+            started = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                self.record(driver_command, time.perf_counter() - started)
+
+        driver.execute = timed_execute
+        return driver
+
+    def snapshot(self, account_id=None):
+        """
+        获取统计快照
+
+        Returns:
+            {(账户 ID, 阶段): {'operations', 'commands', 'wire_seconds', 'by_command': {命令: (次数, 秒数)}}}，
+            指定 account_id 时只包含该账户
+        """
+        with self.lock:
+            keys = set(self.operations) | set(self.commands)
+            result = {}
+            for key in keys:
+                if account_id is not None and key[0] != account_id:
+                    continue
+                by_command = {command: tuple(entry) for command, entry in self.commands.get(key, {}).items()}
+                result[key] = {
+                    'operations': self.operations.get(key, 0),
+                    'commands': sum(count for count, _ in by_command.values()),
+                    'wire_seconds': sum(seconds for _, seconds in by_command.values()),
+                    'by_command': by_command,
+                }
+        return result
+
+
+def format_phase_stats(phase, stats):
+    """格式化单个阶段的统计，例如 "回复 12 次，平均 14.5 条命令 / 1.21 秒" """
+    name = PHASE_NAMES.get(phase, phase)
+    operations = stats['operations']
+    if not operations:
+        return f"{name} {stats['commands']} 条命令 / {stats['wire_seconds']:.2f} 秒"
+    return (f"{name} {operations} 次，平均 {stats['commands'] / operations:.1f} 条命令 / "
+            f"{stats['wire_seconds'] / operations:.2f} 秒")
+
+
+def format_top_commands(stats, limit=3):
+    """按累计耗时列出最耗时的几类命令"""
+    ranked = sorted(stats['by_command'].items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    return '，'.join(f"{command} {count} 次 {seconds:.2f} 秒" for command, (count, seconds) in ranked)
@@ -5,12 +5,74 @@ import argparse
 import logging
 import os
 import sys
+import time
+from datetime import datetime
 from timed_reply import TimedReplyBot, ConfigManager
+from worker_pool import WorkerPool
+from state_store import StateStore
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_duration(value):
+    """解析时间长度，如 30m、24h、7d，纯数字按秒计算"""
+    value = value.strip().lower()
+    unit = DURATION_UNITS.get(value[-1:])
+    try:
+        if unit:
+            return float(value[:-1]) * unit
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的时间长度: {value}（示例: 30m、24h、7d）")
+
+def show_reply_stats(config_manager, args):
+    """从回复日志中查询并显示吞吐量和失败率"""
+    state_file = config_manager.config.get('storage', {}).get('state_file', 'timed_reply_state.db')
+    if not os.path.exists(state_file):
+        print(f"错误: 回复日志 {state_file} 不存在")
+        return 1
+    
+    since = time.time() - args.since if args.since else None
+    store = StateStore(state_file)
+    rows = store.query_reply_stats(
+        since=since,
+        group_by=args.by,
+        bucket_seconds=args.bucket,
+        account_id=args.account,
+        target_id=args.target
+    )
+    store.close()
+    
+    window = f"最近 {args.since_text}" if args.since else "全部时间"
+    print(f"📊 回复统计 ({window}，按{'账户' if args.by == 'account' else '目标'}分组)")
+    if not rows:
+        print("没有符合条件的回复记录")
+        return 0
+    
+    print(f"{'时间段':<20}{'账户':<16}{'目标':<16}{'总数':>8}{'成功':>8}{'失败':>8}{'失败率':>10}{'平均耗时':>12}")
+    print("-" * 98)
+    for row in rows:
+        period = datetime.fromtimestamp(row['bucket_start']).strftime('%Y-%m-%d %H:%M') if args.bucket else '-'
+        failure_rate = row['failed'] / row['total'] * 100 if row['total'] else 0
+        avg_latency = f"{row['avg_latency_ms'] / 1000:.1f}s" if row['avg_latency_ms'] is not None else '-'
+        print(f"{period:<20}{row['account_id']:<16}{row.get('target_id', '-'):<16}"
+              f"{row['total']:>8}{row['succeeded']:>8}{row['failed']:>8}{failure_rate:>9.1f}%{avg_latency:>12}")
+    return 0
 
 def main():
     parser = argparse.ArgumentParser(description='多账户定时回复机器人')
     parser.add_argument('--config', default='config.json', help='配置文件路径 (默认: config.json)')
-    parser.add_argument('--once', action='store_true', help='只执行一次，不持续运行')
+    parser.add_argument('--once', action='store_true', help='每个目标只回复一次后退出（忽略间隔和工作时间，适合外部调度器）')
+    parser.add_argument('--workers', type=int, default=1, help='工作进程数，按账户分片并行运行 (默认: 1)')
+    
+    subparsers = parser.add_subparsers(dest='command', help='可用命令（不指定时运行机器人）')
+    
+    # 回复统计命令
+    stats_parser = subparsers.add_parser('stats', help='查询回复日志中的吞吐量和失败率')
+    stats_parser.add_argument('--since', default='24h', help='统计时间窗口，如 30m、24h、7d，all 表示全部 (默认: 24h)')
+    stats_parser.add_argument('--by', choices=['account', 'target'], default='account', help='分组方式 (默认: account)')
+    stats_parser.add_argument('--bucket', type=parse_duration, help='按时间分桶，如 1h、1d')
+    stats_parser.add_argument('--account', help='只统计指定账户 ID')
+    stats_parser.add_argument('--target', help='只统计指定目标 ID')
     
     args = parser.parse_args()
     
@@ -20,13 +82,24 @@ def main():
         print(f"请复制 config_example.json 为 {args.config} 并修改配置")
         sys.exit(1)
     
+    if args.command == 'stats':
+        args.since_text = args.since
+        try:
+            args.since = None if args.since == 'all' else parse_duration(args.since)
+        except argparse.ArgumentTypeError as e:
+            stats_parser.error(str(e))
+        sys.exit(show_reply_stats(ConfigManager(args.config), args))
+    
+    exit_code = 0
+    
+    if args.workers < 1:
+        print("错误: --workers 必须大于等于 1")
+        sys.exit(1)
+    
     try:
         # 创建配置管理器
         config_manager = ConfigManager(args.config)
         
-        # 创建定时回复机器人
-        bot = TimedReplyBot(config_manager)
-        
         print("🤖 多账户定时回复机器人启动")
         print(f"📁 配置文件: {args.config}")
         
@@ -44,16 +117,33 @@ def main():
         print("按 Ctrl+C 停止机器人")
         print("=" * 50)
         
-        # 运行定时回复任务
-        bot.run_timed_reply()
+        if args.workers > 1:
+            # 多进程模式：账户按稳定哈希分配到各工作进程
+            print(f"⚙️  工作进程数: {args.workers}")
+            all_succeeded = WorkerPool(args.config, args.workers, once=args.once).run()
+            if args.once and not all_succeeded:
+                exit_code = 1
+        elif args.once:
+            # 单次运行：所有目标各回复一次，有失败时以非零状态码退出
+            bot = TimedReplyBot(config_manager)
+            results = bot.run_once()
+            if not all(success for _, _, success in results):
+                exit_code = 1
+        else:
+            # 创建定时回复机器人并运行定时回复任务
+            bot = TimedReplyBot(config_manager)
+            bot.run_timed_reply()
     
     except KeyboardInterrupt:
         print("\n🤖 收到停止信号，正在关闭...")
     except Exception as e:
+        exit_code = 1
         print(f"❌ 程序运行出错: {e}")
         logging.error(f"程序运行出错: {e}")
     finally:
         print("🤖 程序已关闭")
+    
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,144 @@
+"""
+浏览器网络耗时统计 - 解析 Chrome 性能日志（CDP Network 事件），统计每次回复的请求数、传输字节数，
+以及帖子页面和回复提交请求的首字节时间（TTFB）
+"""
+import json
+import threading
+
+
+def reply_post_url(url):
+    """是否为 Discuz 回复提交请求"""
+    return 'mod=post' in url and 'action=reply' in url
+
+
+def response_ttfb_ms(response):
+    """从响应的 timing 中计算首字节时间（发出请求到收到响应头，毫秒），缓存命中等没有 timing 时返回 None"""
+    timing = response.get('timing')
+    if not timing or timing.get('sendStart', -1) < 0 or timing.get('receiveHeadersEnd', -1) < 0:
+        return None
+    return timing['receiveHeadersEnd'] - timing['sendStart']
+
+
+def summarize_network_log(entries):
+    """
+    汇总一段性能日志中的网络事件
+
+    Args:
+        entries: driver.get_log('performance') 返回的日志条目
+
+    Returns:
+        {'requests': 请求数（含重定向）, 'bytes': 传输字节数,
+         'page_ttfb_ms': 帖子页面 TTFB, 'post_ttfb_ms': 回复提交 TTFB}，没有对应请求的 TTFB 为 None
+    """
+    summary = {'requests': 0, 'bytes': 0, 'page_ttfb_ms': None, 'post_ttfb_ms': None}
+    requests = {}  # requestId -> (请求方法, URL, 是否在回复提交之后发出)
+    posted = False
+
+    def on_response(request, response, resource_type):
+        ttfb = response_ttfb_ms(response)
+        if request is None or ttfb is None:
+            return
+        method, url, after_post = request
+        if method == 'POST' and reply_post_url(url):
+            if summary['post_ttfb_ms'] is None:
+                summary['post_ttfb_ms'] = ttfb
+        elif resource_type == 'Document' and not after_post and summary['page_ttfb_ms'] is None:
+            # 提交后重定向回来的帖子页面不算
+            summary['page_ttfb_ms'] = ttfb
+
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+
+        if method == 'Network.requestWillBeSent':
+            request_id = params.get('requestId')
+            if 'redirectResponse' in params:
+                on_response(requests.get(request_id), params['redirectResponse'], params.get('type'))
+            request = params.get('request', {})
+            url = request.get('url', '')
+            requests[request_id] = (request.get('method'), url, posted)
+            if request.get('method') == 'POST' and reply_post_url(url):
+                posted = True
+            summary['requests'] += 1
+        elif method == 'Network.responseReceived':
+            on_response(requests.get(params.get('requestId')), params.get('response', {}), params.get('type'))
+        elif method == 'Network.loadingFinished':
+            summary['bytes'] += params.get('encodedDataLength', 0)
+
+    return summary
+
+
+def format_network_summary(summary):
+    """格式化单次回复的网络统计"""
+    parts = [f"{summary['requests']} 个请求", f"{summary['bytes'] / 1024:.1f} KB"]
+    if summary['page_ttfb_ms'] is not None:
+        parts.append(f"帖子页 TTFB {summary['page_ttfb_ms']:.0f} ms")
+    if summary['post_ttfb_ms'] is not None:
+        parts.append(f"回复提交 TTFB {summary['post_ttfb_ms']:.0f} ms")
+    return '，'.join(parts)
+
+
+class NetworkMetrics:
+    """按账户累计每次回复的网络统计（线程安全）"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accounts = {}  # 账户 ID -> 累计值
+
+    def record(self, account_id, summary):
+        """记录一次回复的网络统计"""
+        with self.lock:
+            totals = self.accounts.setdefault(account_id, {
+                'replies': 0, 'requests': 0, 'bytes': 0,
+                'page_ttfb_ms': 0.0, 'page_count': 0,
+                'post_ttfb_ms': 0.0, 'post_count': 0,
+                'last': None,
+            })
+            totals['replies'] += 1
+            totals['requests'] += summary['requests']
+            totals['bytes'] += summary['bytes']
+            if summary['page_ttfb_ms'] is not None:
+                totals['page_ttfb_ms'] += summary['page_ttfb_ms']
+                totals['page_count'] += 1
+            if summary['post_ttfb_ms'] is not None:
+                totals['post_ttfb_ms'] += summary['post_ttfb_ms']
+                totals['post_count'] += 1
+            totals['last'] = dict(summary)
+
+    def snapshot(self, account_id=None):
+        """
+        获取按账户汇总的统计
+
+        Returns:
+            {账户 ID: {'replies', 'avg_requests', 'avg_bytes', 'avg_page_ttfb_ms', 'avg_post_ttfb_ms', 'last'}}，
+            没有样本的平均 TTFB 为 None
+        """
+        with self.lock:
+            result = {}
+            for key, totals in self.accounts.items():
+                if account_id is not None and key != account_id:
+                    continue
+                replies = totals['replies']
+                result[key] = {
+                    'replies': replies,
+                    'avg_requests': totals['requests'] / replies,
+                    'avg_bytes': totals['bytes'] / replies,
+                    'avg_page_ttfb_ms': totals['page_ttfb_ms'] / totals['page_count'] if totals['page_count'] else None,
+                    'avg_post_ttfb_ms': totals['post_ttfb_ms'] / totals['post_count'] if totals['post_count'] else None,
+                    'last': totals['last'],
+                }
+        return result
+
+
+def format_network_stats(stats):
+    """格式化账户的平均网络统计"""
+    parts = [f"{stats['replies']} 次回复",
+             f"平均 {stats['avg_requests']:.1f} 个请求 / {stats['avg_bytes'] / 1024:.1f} KB"]
+    if stats['avg_page_ttfb_ms'] is not None:
+        parts.append(f"帖子页 TTFB {stats['avg_page_ttfb_ms']:.0f} ms")
+    if stats['avg_post_ttfb_ms'] is not None:
+        parts.append(f"回复提交 TTFB {stats['avg_post_ttfb_ms']:.0f} ms")
+    return '，'.join(parts)
@@ -0,0 +1,147 @@
+"""
+回复模板引擎 - 配置加载时预编译模板，按轮换策略确定性地选择模板
+"""
+import bisect
+import random
+import re
+from datetime import datetime
+
+# 支持的占位符（其他花括号内容按原文保留）
+PLACEHOLDERS = {
+    'timestamp': '当前时间 (YYYY-MM-DD HH:MM:SS)',
+    'date': '当前日期 (YYYY-MM-DD)',
+    'time': '当前时刻 (HH:MM:SS)',
+    'account': '账户 ID',
+    'username': '账户用户名',
+    'target': '目标名称',
+    'target_id': '目标 ID',
+    'count': '该目标的回复序号（模板游标 + 1）',
+}
+PLACEHOLDER_PATTERN = re.compile(r'\{(' + '|'.join(PLACEHOLDERS) + r')\}')
+
+ROTATION_POLICIES = ('round_robin', 'random', 'weighted', 'shuffle')
+
+# 占位符取值函数 (rotation, cursor, now) -> str，渲染时只调用模板中用到的
+FIELD_PROVIDERS = {
+    'timestamp': lambda rotation, cursor, now: now.strftime('%Y-%m-%d %H:%M:%S'),
+    'date': lambda rotation, cursor, now: now.strftime('%Y-%m-%d'),
+    'time': lambda rotation, cursor, now: now.strftime('%H:%M:%S'),
+    'account': lambda rotation, cursor, now: str(rotation.account.get('id', '')),
+    'username': lambda rotation, cursor, now: str(rotation.account.get('username', '')),
+    'target': lambda rotation, cursor, now: str(rotation.target.get('name', '')),
+    'target_id': lambda rotation, cursor, now: str(rotation.target.get('id', '')),
+    'count': lambda rotation, cursor, now: str(cursor + 1),
+}
+
+
+class CompiledTemplate:
+    """预编译的回复模板：文本片段和占位符交替排列，渲染时只做拼接"""
+    __slots__ = ('content', 'weight', 'parts', 'fields')
+
+    def __init__(self, content, weight=1):
+        self.content = content
+        self.weight = weight
+        self.parts = []  # (是否为占位符, 文本或占位符名)
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(content):
+            if match.start() > position:
+                self.parts.append((False, content[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(content):
+            self.parts.append((False, content[position:]))
+        self.fields = frozenset(value for is_field, value in self.parts if is_field)
+
+    def render(self, values):
+        """用占位符取值渲染模板"""
+        return ''.join(values[value] if is_field else value for is_field, value in self.parts)
+
+
+class TemplateRotation:
+    """
+    单个回复目标的模板轮换
+
+    选择结果只由游标决定（round_robin、random、weighted、shuffle 四种策略），
+    游标持久化后重启可以从原位置继续，相同游标总是得到相同的模板。
+    """
+    def __init__(self, templates, policy='round_robin', seed='', account=None, target=None):
+        if policy not in ROTATION_POLICIES:
+            raise ValueError(f"未知的模板轮换策略: {policy}（可选: {', '.join(ROTATION_POLICIES)}）")
+
+        self.templates = [compile_template(template) for template in templates]
+        self.policy = policy
+        self.seed = seed
+        self.account = account or {}
+        self.target = target or {}
+
+        self.cumulative_weights = []
+        total = 0
+        for template in self.templates:
+            if template.weight < 0:
+                raise ValueError(f"模板权重不能为负数: {template.content}")
+            total += template.weight
+            self.cumulative_weights.append(total)
+        if policy == 'weighted' and self.templates and total <= 0:
+            raise ValueError("weighted 策略要求至少一个模板的权重大于 0")
+
+        self._shuffle = (None, None)  # (轮次, 该轮的模板顺序)
+
+    def select(self, cursor):
+        """按游标选择模板"""
+        count = len(self.templates)
+        if self.policy == 'round_robin':
+            return self.templates[cursor % count]
+        if self.policy == 'random':
+            return self.templates[random.Random(f"{self.seed}:{cursor}").randrange(count)]
+        if self.policy == 'weighted':
+            point = random.Random(f"{self.seed}:{cursor}").random() * self.cumulative_weights[-1]
+            return self.templates[bisect.bisect_right(self.cumulative_weights, point)]
+
+        # shuffle：每轮把所有模板打乱后依次使用，一轮之内不重复
+        cycle = cursor // count
+        shuffle_cycle, order = self._shuffle
+        if cycle != shuffle_cycle:
+            order = random.Random(f"{self.seed}:{cycle}").sample(range(count), count)
+            self._shuffle = (cycle, order)
+        return self.templates[order[cursor % count]]
+
+    def render(self, cursor, now=None):
+        """按游标选择模板并渲染，只计算模板中用到的占位符"""
+        template = self.select(cursor)
+        if not template.fields:
+            return template.content
+
+        now = now or datetime.now()
+        return template.render({
+            field: FIELD_PROVIDERS[field](self, cursor, now) for field in template.fields
+        })
+
+    def __len__(self):
+        return len(self.templates)
+
+
+def compile_template(template):
+    """编译单个模板（支持字符串或 {"content": ..., "weight": ...} 格式）"""
+    if isinstance(template, dict):
+        return CompiledTemplate(template.get('content', ''), template.get('weight', 1))
+    return CompiledTemplate(template)
+
+
+def build_rotation(account, target):
+    """根据目标配置构建模板轮换"""
+    return TemplateRotation(
+        target.get('reply_templates', []),
+        policy=target.get('template_policy', 'round_robin'),
+        seed=f"{account.get('id', '')}:{target.get('id', '')}",
+        account=account,
+        target=target
+    )
+
+
+def compile_reply_templates(accounts):
+    """为所有账户的所有目标预编译模板，返回 {(account_id, target_id): TemplateRotation}"""
+    return {
+        (account['id'], target['id']): build_rotation(account, target)
+        for account in accounts
+        for target in account.get('reply_targets', [])
+    }
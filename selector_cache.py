@@ -0,0 +1,90 @@
+"""
+选择器策略缓存 - 记录每个论坛每种页面元素命中的选择器，下次优先尝试
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SelectorCache:
+    """选择器缓存（按论坛地址和元素类型存储，持久化到 JSON 文件）"""
+    def __init__(self, cache_file='selector_cache.json'):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    def load(self):
+        """加载缓存文件"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"选择器缓存文件 {self.cache_file} 读取失败，将重新学习: {e}")
+            return {}
+
+    def save(self):
+        """
+        写入缓存文件（先写临时文件再替换，避免写坏）
+
+        临时文件名每次唯一，多进程模式下各进程同时写入也不会互相覆盖临时文件。
+        调用方需持有 lock。
+        """
+        if not self.cache_file:
+            return
+        temp_file = None
+        try:
+            fd, temp_file = tempfile.mkstemp(
+                prefix=f"{os.path.basename(self.cache_file)}.",
+                suffix='.tmp',
+                dir=os.path.dirname(os.path.abspath(self.cache_file))
+            )
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            logger.warning(f"选择器缓存文件 {self.cache_file} 写入失败: {e}")
+            if temp_file and os.path.exists(temp_file):
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+
+    def get(self, forum, kind):
+        """获取已学习的选择器，返回 (by, value) 或 None"""
+        with self.lock:
+            selector = self.entries.get(forum, {}).get(kind)
+        return tuple(selector) if selector else None
+
+    def _update(self, forum, kind, selector):
+        """
+        修改一项缓存并写回文件，selector 为 None 表示清除，调用方需持有 lock
+
+        修改应用在重新读取的文件内容上，多进程模式下其他进程学到的选择器不会被覆盖。
+        """
+        if self.cache_file:
+            self.entries = self.load()
+        forum_entries = self.entries.setdefault(forum, {})
+        if selector is None:
+            forum_entries.pop(kind, None)
+        else:
+            forum_entries[kind] = list(selector)
+        self.save()
+
+    def remember(self, forum, kind, selector):
+        """记录命中的选择器"""
+        with self.lock:
+            if self.entries.get(forum, {}).get(kind) == list(selector):
+                return
+            self._update(forum, kind, selector)
+
+    def forget(self, forum, kind):
+        """清除失效的选择器"""
+        with self.lock:
+            if self.entries.get(forum, {}).get(kind) is not None:
+                self._update(forum, kind, None)
@@ -0,0 +1,197 @@
+"""
+调度状态存储 - 使用 SQLite (WAL) 持久化每个回复目标的上次回复时间、模板游标和重试状态，
+并记录每次回复的历史日志
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule_state (
+    account_id TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    last_attempt_at REAL,
+    last_success_at REAL,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    template_index INTEGER,
+    PRIMARY KEY (account_id, target_id)
+);
+
+CREATE TABLE IF NOT EXISTS reply_journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    message_hash TEXT,
+    post_id TEXT,
+    latency_ms REAL,
+    outcome TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_created ON reply_journal (created_at);
+CREATE INDEX IF NOT EXISTS idx_journal_account ON reply_journal (account_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_journal_target ON reply_journal (target_id, created_at);
+"""
+
+OUTCOME_SUCCESS = 'success'
+OUTCOME_FAILURE = 'failure'
+
+# 统计查询可用的分组字段
+GROUP_COLUMNS = {
+    'account': 'account_id',
+    'target': 'account_id, target_id',
+}
+
+
+def hash_message(message):
+    """计算回复内容的摘要（只保存摘要，不保存原文）"""
+    if message is None:
+        return None
+    return hashlib.sha1(message.encode('utf-8')).hexdigest()[:16]
+
+
+class StateStore:
+    """调度状态存储（线程安全，多个进程可共用同一个数据库文件）"""
+    def __init__(self, db_file='timed_reply_state.db'):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if db_file != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _ensure_row(self, account_id, target_id):
+        """确保目标的状态行存在，调用方需持有 lock"""
+        self.conn.execute(
+            'INSERT OR IGNORE INTO schedule_state (account_id, target_id) VALUES (?, ?)',
+            (account_id, target_id)
+        )
+
+    def get_target_state(self, account_id, target_id):
+        """获取目标的调度状态，没有记录时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT * FROM schedule_state WHERE account_id = ? AND target_id = ?',
+                (account_id, target_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def record_attempt(self, account_id, target_id, success, attempted_at=None):
+        """记录一次回复结果（成功时清零连续失败次数）"""
+        attempted_at = attempted_at or time.time()
+        with self.lock:
+            self._ensure_row(account_id, target_id)
+            if success:
+                self.conn.execute(
+                    'UPDATE schedule_state SET last_attempt_at = ?, last_success_at = ?, consecutive_failures = 0 '
+                    'WHERE account_id = ? AND target_id = ?',
+                    (attempted_at, attempted_at, account_id, target_id)
+                )
+            else:
+                self.conn.execute(
+                    'UPDATE schedule_state SET last_attempt_at = ?, consecutive_failures = consecutive_failures + 1 '
+                    'WHERE account_id = ? AND target_id = ?',
+                    (attempted_at, account_id, target_id)
+                )
+            self.conn.commit()
+
+    def next_template_index(self, account_id, target_id, initial_index=0):
+        """
+        取出并推进模板游标
+
+        Args:
+            initial_index: 没有持久化游标时的起始值（配置中的 current_template_index）
+
+        Returns:
+            本次使用的游标值（单调递增，由调用方对模板数量取模）
+        """
+        with self.lock:
+            self._ensure_row(account_id, target_id)
+            row = self.conn.execute(
+                'SELECT template_index FROM schedule_state WHERE account_id = ? AND target_id = ?',
+                (account_id, target_id)
+            ).fetchone()
+            index = row['template_index'] if row['template_index'] is not None else initial_index
+            self.conn.execute(
+                'UPDATE schedule_state SET template_index = ? WHERE account_id = ? AND target_id = ?',
+                (index + 1, account_id, target_id)
+            )
+            self.conn.commit()
+        return index
+
+    def record_reply(self, account_id, target_id, success, message, post_id, latency_ms, error=None):
+        """向回复日志追加一条记录"""
+        outcome = OUTCOME_SUCCESS if success else OUTCOME_FAILURE
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO reply_journal '
+                '(account_id, target_id, created_at, message_hash, post_id, latency_ms, outcome, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (account_id, target_id, time.time(), hash_message(message), post_id,
+                 latency_ms, outcome, error)
+            )
+            self.conn.commit()
+
+    def get_last_post_id(self, account_id, target_id):
+        """获取目标最近一次成功回复的 pid，没有记录时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT post_id FROM reply_journal '
+                'WHERE account_id = ? AND target_id = ? AND outcome = ? AND post_id IS NOT NULL '
+                'ORDER BY created_at DESC LIMIT 1',
+                (account_id, target_id, OUTCOME_SUCCESS)
+            ).fetchone()
+        return row['post_id'] if row else None
+
+    def query_reply_stats(self, since=None, group_by='account', bucket_seconds=None,
+                          account_id=None, target_id=None):
+        """
+        按账户或目标统计回复吞吐量和失败率
+
+        Args:
+            since: 起始时间戳，None 表示全部
+            group_by: 分组方式 ('account' 或 'target')
+            bucket_seconds: 时间分桶大小（秒），None 表示不分桶
+            account_id: 只统计指定账户
+            target_id: 只统计指定目标
+
+        Returns:
+            统计行列表，每行包含分组字段、bucket_start、total、succeeded、failed、avg_latency_ms
+        """
+        columns = GROUP_COLUMNS[group_by]
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('created_at >= ?')
+            params.append(since)
+        if account_id:
+            conditions.append('account_id = ?')
+            params.append(account_id)
+        if target_id:
+            conditions.append('target_id = ?')
+            params.append(target_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        if bucket_seconds:
+            bucket = f'CAST(created_at / {int(bucket_seconds)} AS INTEGER) * {int(bucket_seconds)}'
+        else:
+            bucket = 'MIN(created_at)'
+        group = f'{columns}, bucket_start' if bucket_seconds else columns
+
+        sql = (
+            f"SELECT {columns}, {bucket} AS bucket_start, COUNT(*) AS total, "
+            f"SUM(outcome = '{OUTCOME_SUCCESS}') AS succeeded, "
+            f"SUM(outcome = '{OUTCOME_FAILURE}') AS failed, "
+            f"AVG(latency_ms) AS avg_latency_ms "
+            f"FROM reply_journal {where} GROUP BY {group} ORDER BY {group}"
+        )
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
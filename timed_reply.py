@@ -7,29 +7,125 @@ import os
 import sys
 import json
 import threading
-import random
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from urllib.parse import urlencode
+from selector_cache import SelectorCache
+from state_store import StateStore
+from reply_templates import build_rotation, compile_reply_templates
+import discuz_api
+import driver_health
+from driver_metrics import CommandMetrics, format_phase_stats, format_top_commands
+from network_capture import NetworkMetrics, summarize_network_log, format_network_summary, format_network_stats
+from deadline import Deadline
 
-# 导入笑话生成模块
-sys.path.append(os.path.join(os.path.dirname(__file__), 'content', 'joke_stories'))
-try:
-    from joke_generator import JokeGenerator
-    JOKE_GENERATOR_AVAILABLE = True
-except ImportError as e:
-    print(f"警告: 无法导入笑话生成模块: {e}")
-    JOKE_GENERATOR_AVAILABLE = False
+# 已登录页面的特征元素：用户菜单或退出链接
+LOGGED_IN_PROBE_SCRIPT = "return !!document.querySelector(\"#um, a[href*='action=logout']\");"
+
+# 读取页面上 pid 最大的帖子及其作者
+LAST_POST_PROBE_SCRIPT = """
+var best = 0, author = '';
+document.querySelectorAll("div[id^='post_']").forEach(function (el) {
+    var match = /^post_(\\d+)$/.exec(el.id);
+    if (match && +match[1] > best) {
+        best = +match[1];
+        var link = el.querySelector('.authi a.xw1') || el.querySelector('.authi a');
+        author = link ? link.textContent.trim() : '';
+    }
+});
+return [best, author];
+"""
+
+# 读取页面上指定作者的所有帖子 [[pid, 正文], ...]
+AUTHOR_POSTS_SCRIPT = """
+var username = arguments[0], posts = [];
+document.querySelectorAll("div[id^='post_']").forEach(function (el) {
+    var match = /^post_(\\d+)$/.exec(el.id);
+    var link = el.querySelector('.authi a.xw1') || el.querySelector('.authi a');
+    var message = match && document.getElementById('postmessage_' + match[1]);
+    if (message && link && link.textContent.trim() === username) {
+        posts.push([+match[1], message.innerText]);
+    }
+});
+return posts;
+"""
+
+# 一次性设置文本框内容，并触发编辑器依赖的 input/change 事件（代替逐字 send_keys）
+FILL_TEXTAREA_SCRIPT = """
+var element = arguments[0], value = arguments[1];
+element.focus();
+element.value = value;
+element.dispatchEvent(new Event('input', {bubbles: true}));
+element.dispatchEvent(new Event('change', {bubbles: true}));
+return element.value === value;
+"""
+
+# 读取当前页面的 formhash 和页面编码（AJAX 回复模式使用）
+AJAX_CONTEXT_SCRIPT = """
+var input = document.querySelector("input[name='formhash']");
+var match = input ? null : /formhash=([0-9a-zA-Z]{8})/.exec(document.documentElement.innerHTML);
+return [input ? input.value : (match ? match[1] : ''), document.characterSet];
+"""
+
+# 在页面内用 fetch 提交快速回复（同源请求自动带上登录 cookie），按页面编码解码响应
+AJAX_REPLY_SCRIPT = """
+var url = arguments[0], body = arguments[1], done = arguments[arguments.length - 1];
+fetch(url, {
+    method: 'POST',
+    credentials: 'same-origin',
+    headers: {'Content-Type': 'application/x-www-form-urlencoded'},
+    body: body
+}).then(function (response) {
+    return response.arrayBuffer().then(function (buffer) {
+        done([response.ok, new TextDecoder(document.characterSet).decode(buffer)]);
+    });
+}).catch(function (error) {
+    done([false, String(error)]);
+});
+"""
+
+# 回复时间预算内，开始各阶段前至少需要剩余的时间（秒）
+MIN_PAGE_LOAD_SECONDS = 5
+MIN_SUBMIT_SECONDS = 2
+
+# 生成回复内容时为提交和确认回复预留的时间（秒），在线笑话接口较慢时改用本地笑话而不是耗尽预算
+REPLY_SUBMIT_RESERVE_SECONDS = MIN_SUBMIT_SECONDS + 3
+
+# 笑话生成模块所在目录（仅在有目标启用笑话生成时才导入）
+JOKE_STORIES_DIR = os.path.join(os.path.dirname(__file__), 'content', 'joke_stories')
+_joke_generator_class = None
+
+def _add_joke_stories_path():
+    """把笑话模块目录加入导入路径"""
+    if JOKE_STORIES_DIR not in sys.path:
+        sys.path.append(JOKE_STORIES_DIR)
+
+def load_joke_generator_class():
+    """按需导入笑话生成模块，导入失败返回 None"""
+    global _joke_generator_class
+    if _joke_generator_class is None:
+        _add_joke_stories_path()
+        try:
+            from joke_generator import JokeGenerator
+            _joke_generator_class = JokeGenerator
+        except ImportError as e:
+            print(f"警告: 无法导入笑话生成模块: {e}")
+            _joke_generator_class = False
+    return _joke_generator_class or None
+
+def account_shard(account_id, shard_count):
+    """根据账户 ID 的稳定哈希计算其所属分片"""
+    return zlib.crc32(str(account_id).encode('utf-8')) % shard_count
 
 class ConfigManager:
     """配置文件管理器"""
     def __init__(self, config_file='config.json'):
         self.config_file = config_file
         self.config = self.load_config()
+        self.shard_index = 0
+        self.shard_count = 1
     
     def load_config(self):
         """加载配置文件"""
@@ -43,9 +139,18 @@ class ConfigManager:
             print(f"配置文件格式错误: {e}")
             sys.exit(1)
     
+    def set_shard(self, shard_index, shard_count):
+        """只保留属于指定分片的账户（多进程模式）"""
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+    
     def get_enabled_accounts(self):
         """获取启用的账户列表"""
-        return [account for account in self.config['accounts'] if account.get('enabled', True)]
+        accounts = [account for account in self.config['accounts'] if account.get('enabled', True)]
+        if self.shard_count > 1:
+            accounts = [account for account in accounts
+                        if account_shard(account['id'], self.shard_count) == self.shard_index]
+        return accounts
     
     def get_enabled_targets(self, account):
         """获取账户下启用的回复目标列表"""
@@ -63,7 +168,34 @@ class TimedReplyBot:
         self.config = config_manager.config
         self.drivers = {}  # 存储每个账户的浏览器驱动
         self.reply_stats = {}  # 存储每个账户的回复统计
+        self.account_usernames = {}  # 账户 ID 到用户名的映射（用于确认回复作者）
+        self.ajax_contexts = {}  # 账户 ID 到 (formhash, 页面编码) 的映射（AJAX 回复模式）
+        self.logged_in_accounts = set()
+        self.account_configs = {}  # 账户 ID 到账户配置的映射（回收浏览器后需要重新登录时使用）
+        self.navigation_counts = {}  # 每个账户的浏览器自启动以来的页面导航次数
+        self.target_tabs = {}  # 账户 ID 到 {目标 ID: 标签页句柄} 的映射，按最近使用排序
+        
+        # 同一账户的多个目标共用一个浏览器，操作浏览器时需持有该账户的锁
+        self.account_locks = {}
+        self.account_locks_lock = threading.Lock()
+        
+        # 共享浏览器模式（browser.shared_process）：所有账户共用一个浏览器，各自使用独立的浏览器上下文
+        self.shared_driver = None
+        self.shared_driver_lock = threading.Lock()
+        self.browser_contexts = {}  # 账户 ID 到浏览器上下文 ID 的映射
+        self.account_windows = {}  # 账户 ID 到其主标签页句柄的映射
+        
+        # 卡死检测：登录或回复超过时间预算时关闭卡住的浏览器
+        self.watchdog = driver_health.Watchdog(self.handle_hung_operation)
+        
+        # WebDriver 命令统计：按 (账户, 阶段) 记录命令次数和往返耗时
+        self.command_metrics = CommandMetrics()
+        
+        # 网络耗时统计（browser.network_capture）：每次回复的请求数、传输字节数和 TTFB
+        self.network_metrics = NetworkMetrics()
+        self.stats_lock = threading.Lock()
         self.running = False
+        self.show_stats = True  # 多进程模式下由父进程统一显示统计
         self.threads = []
         
         # 工作时间配置（从配置文件中读取，默认 8:00-23:00 工作日）
@@ -73,17 +205,71 @@ class TimedReplyBot:
             'weekdays_only': True  # 仅工作日
         })
         
-        # 初始化笑话生成器
-        if JOKE_GENERATOR_AVAILABLE:
-            self.joke_generator = JokeGenerator()
-            self.logger = logging.getLogger(__name__)
-            self.logger.info("笑话生成器已启用")
-        else:
-            self.joke_generator = None
-            self.logger = logging.getLogger(__name__)
-            self.logger.warning("笑话生成器不可用，将使用默认回复模板")
+        # 选择器策略缓存（按论坛记录命中的选择器）
+        self.selector_cache = SelectorCache(
+            self.config.get('browser', {}).get('selector_cache_file', 'selector_cache.json')
+        )
+        
+        # 预编译所有目标的回复模板
+        self.template_rotations = compile_reply_templates(self.config.get('accounts', []))
+        
+        # 调度状态存储（上次回复时间、模板游标、重试状态）
+        storage_config = self.config.get('storage', {})
+        self.state_store = StateStore(storage_config.get('state_file', 'timed_reply_state.db'))
+        
+        # 笑话生成器在第一个启用笑话生成的目标需要时才创建
+        self._joke_generator = None
+        self._joke_generator_loaded = False
+        self.joke_generator_lock = threading.Lock()
         
         self.setup_logging()
+        
+        if self.config.get('browser', {}).get('recycle_max_rss_mb') and not driver_health.is_rss_available():
+            self.logger.warning("未安装 psutil，无法按内存占用回收浏览器（仅按导航次数回收）")
+        
+        # 自定义笑话模板在启动时校验（只导入轻量的模板模块），避免发帖时才发现错误
+        self.joke_templates = self.config.get('joke_templates', {})
+        self.validate_joke_templates()
+    
+    @property
+    def joke_generator(self):
+        """按需创建笑话生成器，不可用时返回 None"""
+        if not self._joke_generator_loaded:
+            with self.joke_generator_lock:
+                if not self._joke_generator_loaded:
+                    generator_class = load_joke_generator_class()
+                    if generator_class:
+                        self._joke_generator = generator_class(templates=self.joke_templates)
+                        self.logger.info("笑话生成器已启用")
+                    else:
+                        self.logger.warning("笑话生成器不可用，将使用默认回复模板")
+                    self._joke_generator_loaded = True
+        return self._joke_generator
+    
+    def validate_joke_templates(self):
+        """
+        校验自定义笑话模板和各目标使用的笑话格式
+        
+        Raises:
+            ValueError: 模板格式错误或引用了不支持的字段
+        """
+        joke_targets = [
+            target
+            for account in self.config.get('accounts', [])
+            for target in account.get('reply_targets', [])
+            if target.get('joke_generation', {}).get('enabled', False)
+        ]
+        if not self.joke_templates and not joke_targets:
+            return
+        
+        _add_joke_stories_path()
+        from joke_templates import BUILTIN_TEMPLATES, compile_templates
+        
+        compiled = compile_templates({**BUILTIN_TEMPLATES, **self.joke_templates})
+        for target in joke_targets:
+            format_type = target['joke_generation'].get('format', 'story_format')
+            if format_type not in compiled:
+                self.logger.warning(f"目标 {target['id']} 的笑话格式 {format_type} 不存在，将使用 simple 格式")
     
     def setup_logging(self):
         """设置日志"""
@@ -133,8 +319,46 @@ class TimedReplyBot:
         
         return True
     
-    def init_driver(self, account_id):
-        """为指定账户初始化浏览器驱动"""
+    def get_engine_type(self):
+        """获取回复引擎类型（selenium 或 async_http）"""
+        return self.config.get('global_settings', {}).get('engine', 'selenium')
+    
+    def get_reply_mode(self):
+        """获取浏览器回复方式（form：在帖子页面填写并提交；ajax：页面内直接提交快速回复请求）"""
+        return self.config.get('browser', {}).get('reply_mode', 'form')
+    
+    def use_shared_process(self):
+        """是否让所有账户共用一个浏览器进程（每个账户一个独立的浏览器上下文）"""
+        return self.config.get('browser', {}).get('shared_process', False)
+    
+    def use_network_capture(self):
+        """是否记录每次回复的网络耗时（通过 Chrome 性能日志）"""
+        return self.config.get('browser', {}).get('network_capture', False)
+    
+    def read_network_log(self, account_id):
+        """读取并清空账户浏览器的性能日志，失败时返回 None"""
+        driver = self.drivers.get(account_id)
+        if driver is None:
+            return None
+        try:
+            return driver.get_log('performance')
+        except Exception as e:
+            self.logger.debug(f"账户 {account_id} 读取性能日志失败: {e}")
+            return None
+    
+    def record_network_capture(self, account_id, entries):
+        """汇总一次回复期间的网络事件"""
+        if entries is None:
+            return
+        summary = summarize_network_log(entries)
+        self.network_metrics.record(account_id, summary)
+        self.logger.info(f"账户 {account_id} 回复网络统计: {format_network_summary(summary)}")
+    
+    def create_chrome(self):
+        """按配置启动一个 Chrome 浏览器"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        
         browser_config = self.config.get('browser', {})
         chrome_options = Options()
         
@@ -147,17 +371,343 @@ class TimedReplyBot:
         chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument(f'--window-size={browser_config.get("window_size", "1920,1080")}')
         
+        if self.use_network_capture():
+            # 由 chromedriver 启用 CDP Network 域，事件写入性能日志
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+            chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+        
+        driver = webdriver.Chrome(options=chrome_options)
+        
+        # 页面加载和脚本执行超时，避免论坛响应卡住时调用永远不返回
+        driver.set_page_load_timeout(browser_config.get('page_load_timeout_seconds', 30))
+        driver.set_script_timeout(browser_config.get('script_timeout_seconds', 30))
+        
+        if browser_config.get('command_metrics', True):
+            self.command_metrics.instrument(driver)
+        return driver
+    
+    def init_driver(self, account_id):
+        """为指定账户初始化浏览器驱动"""
+        if self.use_shared_process():
+            return self.init_context_driver(account_id)
+        
         try:
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = self.create_chrome()
             self.drivers[account_id] = driver
+            self.navigation_counts[account_id] = 0
             self.logger.info(f"账户 {account_id} 浏览器驱动初始化成功")
             return True
         except Exception as e:
             self.logger.error(f"账户 {account_id} 浏览器驱动初始化失败: {e}")
             return False
     
+    def init_context_driver(self, account_id):
+        """
+        在共享浏览器中为账户创建独立的浏览器上下文（CDP Target.createBrowserContext）
+        
+        每个上下文有独立的 cookie，账户之间互不影响，但共用一个浏览器进程。
+        """
+        try:
+            with self.shared_driver_lock:
+                if self.shared_driver is None:
+                    self.shared_driver = self.create_chrome()
+                    self.logger.info("共享浏览器初始化成功")
+            driver = self.shared_driver
+            
+            context_id = driver.execute_cdp_cmd(
+                'Target.createBrowserContext', {'disposeOnDetach': False}
+            )['browserContextId']
+            handle = self.open_context_tab(driver, context_id)
+            driver.switch_to.window(handle)
+            
+            self.browser_contexts[account_id] = context_id
+            self.account_windows[account_id] = handle
+            self.drivers[account_id] = driver
+            self.logger.info(f"账户 {account_id} 浏览器上下文创建成功")
+            return True
+        except Exception as e:
+            self.logger.error(f"账户 {account_id} 浏览器上下文创建失败: {e}")
+            return False
+    
+    def open_context_tab(self, driver, context_id):
+        """在指定浏览器上下文中新开一个标签页，返回其窗口句柄"""
+        target_id = driver.execute_cdp_cmd(
+            'Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id}
+        )['targetId']
+        # chromedriver 的窗口句柄即 CDP 的 targetId（部分旧版本带有前缀）
+        for handle in driver.window_handles:
+            if handle == target_id or handle.endswith(target_id):
+                return handle
+        return target_id
+    
+    def activate_account_window(self, account_id):
+        """共享浏览器模式下切换到账户的主标签页（调用方需持有账户锁）"""
+        handle = self.account_windows.get(account_id)
+        if handle and account_id in self.drivers:
+            self.drivers[account_id].switch_to.window(handle)
+    
+    def get_operation_timeout(self):
+        """单次登录或回复的时间预算（秒），超过后由看门狗关闭浏览器，0 表示不检测"""
+        return self.config.get('browser', {}).get('operation_timeout_seconds', 180)
+    
+    def handle_hung_operation(self, account_id, description):
+        """
+        看门狗回调：关闭卡住的浏览器
+        
+        阻塞在该浏览器上的调用会随之抛出异常，下次回复前会重新创建浏览器并登录。
+        共享浏览器模式下所有账户的浏览器会一起关闭。
+        """
+        driver = self.drivers.get(account_id)
+        if driver is None:
+            return
+        
+        affected = [other_id for other_id, other in list(self.drivers.items()) if other is driver]
+        self.logger.error(
+            f"账户 {account_id} {description}超过 {self.get_operation_timeout()} 秒，"
+            f"关闭卡住的浏览器（影响账户: {', '.join(affected)}）"
+        )
+        
+        for other_id in affected:
+            self.drivers.pop(other_id, None)
+            self.logged_in_accounts.discard(other_id)
+            self.ajax_contexts.pop(other_id, None)
+            self.target_tabs.pop(other_id, None)
+            self.navigation_counts.pop(other_id, None)
+            self.browser_contexts.pop(other_id, None)
+            self.account_windows.pop(other_id, None)
+        if driver is self.shared_driver:
+            self.shared_driver = None
+        
+        driver_health.force_quit(driver)
+    
+    def ensure_logged_in(self, account_id):
+        """浏览器被看门狗关闭或回收后未能恢复登录时重新登录（必要时重新创建浏览器），返回账户是否可以回复"""
+        if account_id in self.drivers and account_id in self.logged_in_accounts:
+            return True
+        account = self.account_configs.get(account_id)
+        if not account:
+            return False
+        self.logger.info(f"账户 {account_id} 未登录或浏览器驱动不存在，重新登录")
+        return self.login(account)
+    
+    def navigate(self, account_id, driver, url, deadline=None):
+        """
+        访问页面并记录导航次数
+        
+        传入 deadline 时，剩余时间不足 MIN_PAGE_LOAD_SECONDS 则放弃访问（抛出 DeadlineExceeded），
+        页面加载超时也不超过剩余时间。
+        """
+        page_load_timeout = self.config.get('browser', {}).get('page_load_timeout_seconds', 30)
+        budget = page_load_timeout
+        if deadline is not None:
+            deadline.require(MIN_PAGE_LOAD_SECONDS, '访问页面')
+            budget = deadline.cap(page_load_timeout)
+        
+        self.navigation_counts[account_id] = self.navigation_counts.get(account_id, 0) + 1
+        if budget >= page_load_timeout:
+            driver.get(url)
+            return
+        
+        driver.set_page_load_timeout(budget)
+        try:
+            driver.get(url)
+        finally:
+            driver.set_page_load_timeout(page_load_timeout)
+    
+    def execute_async_script(self, driver, deadline, script, *args):
+        """执行异步脚本，脚本超时不超过 deadline 的剩余时间"""
+        script_timeout = self.config.get('browser', {}).get('script_timeout_seconds', 30)
+        budget = deadline.cap(script_timeout)
+        if budget >= script_timeout:
+            return driver.execute_async_script(script, *args)
+        
+        driver.set_script_timeout(budget)
+        try:
+            return driver.execute_async_script(script, *args)
+        finally:
+            driver.set_script_timeout(script_timeout)
+    
+    def check_driver_recycle(self, account_id):
+        """
+        回复前检查浏览器是否需要回收（调用方需持有账户锁）
+        
+        按 browser 配置中的 recycle_max_navigations（导航次数）和 recycle_max_rss_mb
+        （整个浏览器进程树的内存占用，需要 psutil）判断，0 表示不限制。
+        共享浏览器模式下所有账户共用一个进程，不按账户回收。
+        """
+        driver = self.drivers.get(account_id)
+        if driver is None or self.use_shared_process():
+            return
+        
+        browser_config = self.config.get('browser', {})
+        max_navigations = browser_config.get('recycle_max_navigations', 0)
+        max_rss_mb = browser_config.get('recycle_max_rss_mb', 0)
+        
+        navigations = self.navigation_counts.get(account_id, 0)
+        if max_navigations and navigations >= max_navigations:
+            self.recycle_driver(account_id, f"已导航 {navigations} 次")
+            return
+        
+        if max_rss_mb:
+            rss = driver_health.driver_rss(driver)
+            if rss is not None and rss >= max_rss_mb * 1024 * 1024:
+                self.recycle_driver(account_id, f"内存占用 {rss / 1024 / 1024:.0f} MB")
+    
+    def recycle_driver(self, account_id, reason):
+        """回收账户的浏览器（调用方需持有账户锁），启动浏览器、恢复 cookie 和重新登录卡住时由看门狗关闭浏览器"""
+        with self.command_metrics.phase(account_id, 'recycle'), \
+                self.watchdog.watch(account_id, self.get_operation_timeout(), '回收浏览器'):
+            return self._recycle_driver(account_id, reason)
+    
+    def _recycle_driver(self, account_id, reason):
+        """
+        用新的浏览器替换账户当前的浏览器，并带上原浏览器的 cookie（调用方需持有账户锁）
+        
+        先启动新浏览器再关闭旧浏览器，新浏览器启动失败时继续使用旧浏览器；
+        cookie 失效时重新登录。
+        
+        Returns:
+            是否已替换为新浏览器
+        """
+        old_driver = self.drivers[account_id]
+        self.logger.info(f"账户 {account_id} 回收浏览器（{reason}）")
+        
+        try:
+            cookies = old_driver.get_cookies()
+            new_driver = self.create_chrome()
+        except Exception as e:
+            self.logger.error(f"账户 {account_id} 启动新浏览器失败，继续使用原浏览器: {e}")
+            return False
+        
+        self.drivers[account_id] = new_driver
+        self.navigation_counts[account_id] = 0
+        self.ajax_contexts.pop(account_id, None)
+        self.target_tabs.pop(account_id, None)
+        
+        try:
+            old_driver.quit()
+        except Exception as e:
+            self.logger.warning(f"账户 {account_id} 关闭原浏览器时出错: {e}")
+        
+        # cookie 只能添加到当前打开的域名下
+        forum_url = self.config['forum']['base_url']
+        logged_in = False
+        try:
+            self.navigate(account_id, new_driver, forum_url)
+            for cookie in cookies:
+                try:
+                    new_driver.add_cookie(cookie)
+                except Exception:
+                    continue  # 其他域名的 cookie
+            self.navigate(account_id, new_driver, forum_url)
+            # 登录凭证 cookie 刚从原浏览器复制过来，只能从页面判断会话是否仍然有效
+            logged_in = bool(new_driver.execute_script(LOGGED_IN_PROBE_SCRIPT))
+        except Exception as e:
+            self.logger.warning(f"账户 {account_id} 恢复 cookie 失败: {e}")
+        
+        if logged_in:
+            self.logger.info(f"账户 {account_id} 浏览器已回收，登录状态已恢复")
+            return True
+        
+        self.logger.info(f"账户 {account_id} 浏览器已回收，登录状态未能恢复，重新登录")
+        self.logged_in_accounts.discard(account_id)
+        account = self.account_configs.get(account_id)
+        if account and self._login(account):
+            self.logged_in_accounts.add(account_id)
+        return True
+    
+    def find_element_cached(self, driver, kind, selectors, wait_seconds=0):
+        """
+        按选择器列表查找元素，优先尝试该论坛上次命中的选择器
+        
+        Args:
+            driver: 浏览器驱动
+            kind: 元素类型（如 login_username、reply_textarea），作为缓存键
+            selectors: 候选选择器列表 [(by, value), ...]
+            wait_seconds: 每个候选选择器的最长等待时间，0 表示不等待
+            
+        Returns:
+            找到的元素，未找到返回 None
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException, NoSuchElementException
+        
+        forum = self.config['forum']['base_url']
+        
+        def try_selector(selector):
+            try:
+                if wait_seconds > 0:
+                    return WebDriverWait(driver, wait_seconds).until(EC.presence_of_element_located(selector))
+                return driver.find_element(*selector)
+            except (TimeoutException, NoSuchElementException):
+                return None
+        
+        cached = self.selector_cache.get(forum, kind)
+        if cached:
+            element = try_selector(cached)
+            if element is not None:
+                return element
+            self.logger.info(f"缓存的选择器失效 {kind}: {cached[0]}={cached[1]}，尝试其他选择器")
+            self.selector_cache.forget(forum, kind)
+        
+        for selector in selectors:
+            if cached and tuple(selector) == cached:
+                continue
+            element = try_selector(selector)
+            if element is not None:
+                self.logger.info(f"找到元素 {kind}: {selector[0]}={selector[1]}")
+                self.selector_cache.remember(forum, kind, selector)
+                return element
+        
+        return None
+    
+    def forget_selectors(self, account_id, kinds):
+        """
+        登录或回复确认失败时清除本次使用的选择器
+        
+        通用的候选选择器（如 button[type='submit']）可能命中了无关元素，清除后下次重新按候选顺序查找。
+        """
+        forum = self.config['forum']['base_url']
+        for kind in kinds:
+            if self.selector_cache.get(forum, kind):
+                self.logger.info(f"账户 {account_id} 清除可能有误的选择器缓存: {kind}")
+                self.selector_cache.forget(forum, kind)
+    
+    def is_logged_in(self, driver):
+        """通过登录凭证 cookie 或退出链接判断是否已登录"""
+        cookie_names = [cookie['name'] for cookie in driver.get_cookies()]
+        if discuz_api.has_auth_cookie(cookie_names):
+            return True
+        return bool(driver.execute_script(LOGGED_IN_PROBE_SCRIPT))
+    
+    def get_account_lock(self, account_id):
+        """获取账户的浏览器操作锁（共享浏览器同一时间只能操作一个标签页，所有账户共用一把锁）"""
+        key = None if self.use_shared_process() else account_id
+        with self.account_locks_lock:
+            return self.account_locks.setdefault(key, threading.RLock())
+    
     def login(self, account):
+        """登录指定账户（同一账户的多个目标只登录一次）"""
+        account_id = account['id']
+        with self.get_account_lock(account_id):
+            self.account_configs[account_id] = account
+            if account_id in self.logged_in_accounts and account_id in self.drivers:
+                return True
+            with self.command_metrics.phase(account_id, 'login'), \
+                    self.watchdog.watch(account_id, self.get_operation_timeout(), '登录'):
+                self.activate_account_window(account_id)
+                success = self._login(account)
+            if success:
+                self.logged_in_accounts.add(account_id)
+            return success
+    
+    def _login(self, account):
         """登录指定账户"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException, JavascriptException
+        
         account_id = account['id']
         username = account['username']
         password = account['password']
@@ -168,52 +718,36 @@ class TimedReplyBot:
         
         driver = self.drivers[account_id]
         forum_url = self.config['forum']['base_url']
+        self.account_usernames[account_id] = username
+        self.ajax_contexts.pop(account_id, None)  # 登录后 formhash 会变化
+        self.target_tabs.pop(account_id, None)  # 登录页面会占用当前标签页
         
         try:
             self.logger.info(f"账户 {account_id} 开始登录: {username}")
-            driver.get(f"{forum_url}/member.php?mod=logging&action=login")
+            self.navigate(account_id, driver, f"{forum_url}/member.php?mod=logging&action=login")
             time.sleep(3)
             
-            # 等待登录表单加载
-            wait = WebDriverWait(driver, 10)
-            
-            # 查找用户名输入框
-            username_input = None
+            # 查找用户名输入框（等待登录表单加载）
             username_selectors = [
                 (By.NAME, "username"),
                 (By.NAME, "login_username"),
                 (By.ID, "username"),
                 (By.ID, "login_username")
             ]
-            
-            for selector_type, selector_value in username_selectors:
-                try:
-                    username_input = wait.until(EC.presence_of_element_located((selector_type, selector_value)))
-                    self.logger.info(f"账户 {account_id} 找到用户名输入框: {selector_type}={selector_value}")
-                    break
-                except TimeoutException:
-                    continue
+            username_input = self.find_element_cached(driver, 'login_username', username_selectors, wait_seconds=10)
             
             if not username_input:
                 self.logger.error(f"账户 {account_id} 未找到用户名输入框")
                 return False
             
             # 查找密码输入框
-            password_input = None
             password_selectors = [
                 (By.NAME, "password"),
                 (By.NAME, "login_password"),
                 (By.ID, "password"),
                 (By.ID, "login_password")
             ]
-            
-            for selector_type, selector_value in password_selectors:
-                try:
-                    password_input = driver.find_element(selector_type, selector_value)
-                    self.logger.info(f"账户 {account_id} 找到密码输入框: {selector_type}={selector_value}")
-                    break
-                except NoSuchElementException:
-                    continue
+            password_input = self.find_element_cached(driver, 'login_password', password_selectors)
             
             if not password_input:
                 self.logger.error(f"账户 {account_id} 未找到密码输入框")
@@ -235,37 +769,24 @@ class TimedReplyBot:
                     (By.ID, "questionid"),
                     (By.CSS_SELECTOR, "select[name='questionid']")
                 ]
-                
-                for selector_type, selector_value in security_selectors:
-                    try:
-                        security_element = driver.find_element(selector_type, selector_value)
-                        from selenium.webdriver.support.ui import Select
-                        select = Select(security_element)
-                        if len(select.options) > 0:
-                            select.select_by_index(0)
-                            self.logger.info(f"账户 {account_id} 处理安全提问字段")
-                        break
-                    except:
-                        continue
+                security_element = self.find_element_cached(driver, 'login_security', security_selectors)
+                if security_element:
+                    from selenium.webdriver.support.ui import Select
+                    select = Select(security_element)
+                    if len(select.options) > 0:
+                        select.select_by_index(0)
+                        self.logger.info(f"账户 {account_id} 处理安全提问字段")
             except Exception as e:
                 self.logger.debug(f"账户 {account_id} 安全提问字段处理: {e}")
             
             # 查找登录按钮
-            login_button = None
             button_selectors = [
                 (By.NAME, "loginsubmit"),
                 (By.ID, "loginsubmit"),
                 (By.CSS_SELECTOR, "input[type='submit']"),
                 (By.CSS_SELECTOR, "button[type='submit']")
             ]
-            
-            for selector_type, selector_value in button_selectors:
-                try:
-                    login_button = driver.find_element(selector_type, selector_value)
-                    self.logger.info(f"账户 {account_id} 找到登录按钮: {selector_type}={selector_value}")
-                    break
-                except NoSuchElementException:
-                    continue
+            login_button = self.find_element_cached(driver, 'login_button', button_selectors)
             
             if not login_button:
                 self.logger.error(f"账户 {account_id} 未找到登录按钮")
@@ -275,43 +796,42 @@ class TimedReplyBot:
             self.logger.info(f"账户 {account_id} 点击登录按钮")
             login_button.click()
             
-            # 等待登录完成
-            time.sleep(5)
-            
-            # 检查是否登录成功
-            page_source = driver.page_source
-            success_indicators = [
-                "欢迎",
-                "退出", 
-                "logout",
-                "个人中心",
-                "我的",
-                username
-            ]
-            
-            login_success = False
-            for indicator in success_indicators:
-                if indicator in page_source:
-                    self.logger.info(f"账户 {account_id} 登录成功，找到指示器: {indicator}")
-                    login_success = True
-                    break
-            
-            if not login_success:
+            # 等待登录完成（检测到登录凭证即返回，不读取整页源码）
+            try:
+                WebDriverWait(
+                    driver, 10, poll_frequency=0.5,
+                    ignored_exceptions=(JavascriptException,)  # 跳转过程中脚本可能执行失败
+                ).until(lambda d: self.is_logged_in(d))
+            except TimeoutException:
                 self.logger.error(f"账户 {account_id} 登录失败")
+                self.forget_selectors(account_id, ['login_username', 'login_password', 'login_button'])
                 return False
-            else:
-                self.logger.info(f"账户 {account_id} 登录成功")
-                return True
+            
+            self.logger.info(f"账户 {account_id} 登录成功")
+            return True
                 
         except Exception as e:
             self.logger.error(f"账户 {account_id} 登录过程错误: {e}")
             return False
     
-    def get_reply_message(self, target):
-        """生成回复消息（支持笑话生成和模板）"""
+    def get_reply_budget(self):
+        """单次回复的时间预算（秒），0 表示不限时"""
+        return self.config.get('global_settings', {}).get('reply_budget_seconds', 90)
+    
+    def get_reply_message(self, target, account_id='', deadline=None):
+        """
+        生成回复消息（支持笑话生成和模板）
+        
+        Args:
+            deadline: 本次回复的截止时间，获取在线笑话时为提交和确认预留
+                REPLY_SUBMIT_RESERVE_SECONDS 秒（剩余时间不足时改用本地笑话库）
+        """
         # 检查是否启用笑话生成
         joke_config = target.get('joke_generation', {})
         if joke_config.get('enabled', False) and self.joke_generator:
+            joke_deadline = None
+            if deadline is not None and deadline.expires_at is not None:
+                joke_deadline = deadline.expires_at - REPLY_SUBMIT_RESERVE_SECONDS
             try:
                 # 获取笑话生成配置
                 category = joke_config.get('category', 'any')
@@ -322,7 +842,8 @@ class TimedReplyBot:
                     count=1,
                     format_type=format_type,
                     category=category,
-                    include_metadata=joke_config.get('include_metadata', False)
+                    include_metadata=joke_config.get('include_metadata', False),
+                    deadline=joke_deadline
                 )
                 
                 # 如果配置了笑话前缀或后缀，添加它们
@@ -341,108 +862,503 @@ class TimedReplyBot:
                 self.logger.error(f"笑话生成失败，回退到模板模式: {e}")
                 # 如果笑话生成失败，回退到模板模式
         
-        # 使用传统模板模式
-        templates = target.get('reply_templates', [])
-        if not templates:
+        # 使用传统模板模式（模板已在加载配置时预编译）
+        rotation = self.template_rotations.get((account_id, target['id']))
+        if rotation is None:
+            rotation = build_rotation({'id': account_id}, target)
+        if not len(rotation):
             return f"我在认真的水帖, - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        # 随机选择一个模板
-        template = random.choice(templates)
+        # 按持久化的模板游标选择模板（起始位置为配置中的 current_template_index）
+        cursor = self.state_store.next_template_index(
+            account_id, target['id'], target.get('current_template_index', 0)
+        )
+        return rotation.render(cursor)
+    
+    
+    def _get_account_stats(self, account_id):
+        """获取（必要时创建）账户的统计记录，调用方需持有 stats_lock"""
+        if account_id not in self.reply_stats:
+            self.reply_stats[account_id] = {
+                'total_replies': 0,
+                'failed_replies': 0,
+                'last_reply_time': None,
+                'last_post_id': None,
+                'start_time': datetime.now()
+            }
+        return self.reply_stats[account_id]
+    
+    def record_reply(self, account_id, post_id=None):
+        """记录一次成功回复，返回该账户的累计回复数"""
+        with self.stats_lock:
+            stats = self._get_account_stats(account_id)
+            stats['total_replies'] += 1
+            stats['last_reply_time'] = datetime.now()
+            if post_id:
+                stats['last_post_id'] = post_id
+            return stats['total_replies']
+    
+    def record_failure(self, account_id):
+        """记录一次失败的回复"""
+        with self.stats_lock:
+            self._get_account_stats(account_id)['failed_replies'] += 1
+    
+    def get_last_post(self, driver):
+        """获取页面上最后一个帖子的 (pid, 作者)，没有帖子时 pid 为 0"""
+        try:
+            pid, author = driver.execute_script(LAST_POST_PROBE_SCRIPT)
+            return int(pid or 0), author or ''
+        except Exception:
+            return 0, ''
+    
+    def verify_reply(self, driver, account_id, last_pid_before, deadline=None, url_before=None):
+        """
+        确认回复已发布成功
+        
+        快速回复通过 AJAX 把新帖子插入当前页面；普通回复会跳转到带 pid 的地址。
+        两种情况都只读取少量数据，而不是整页源码。
         
-        # 处理模板格式（支持新旧格式）
-        if isinstance(template, dict):
-            content = template.get('content', '')
-        else:
-            content = template
+        Args:
+            last_pid_before: 提交前页面上最大的 pid
+            url_before: 提交前的页面地址（目标链接或常驻标签页本身可能就是带 pid 的楼层链接，地址未变化时不采用其中的 pid）
+        
+        Returns:
+            新帖子的 pid，未检测到返回 None
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        
+        username = self.account_usernames.get(account_id)
+        timeout = self.config.get('global_settings', {}).get('reply_verify_timeout_seconds', 10)
+        if deadline is not None:
+            timeout = deadline.cap(timeout)
+        
+        def new_post_id(d):
+            current_url = d.current_url
+            if current_url != url_before:
+                post_id = discuz_api.parse_post_id(current_url)
+                if post_id and int(post_id) > last_pid_before:
+                    return post_id
+            pid, author = self.get_last_post(d)
+            if pid > last_pid_before and (not author or not username or author == username):
+                return str(pid)
+            return False
+        
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=0.5).until(new_post_id)
+        except TimeoutException:
+            return None
+    
+    def get_retry_policy(self):
+        """获取回复失败后的重试次数和重试间隔"""
+        settings = self.config.get('global_settings', {})
+        return max(1, settings.get('retry_attempts', 1)), settings.get('retry_delay_seconds', 30)
+    
+    def post_reply_with_retry(self, account_id, target):
+        """
+        发布回复，失败时按配置重试
+        
+        已点击提交但未确认成功的回复可能只是论坛响应慢，重试前先检查它是否已经发布，避免重复回复。
+        """
+        attempts, retry_delay = self.get_retry_policy()
+        success = False
+        unconfirmed = None  # 上一次已点击提交但未确认成功的回复记录
+        for attempt in range(1, attempts + 1):
+            self.ensure_logged_in(account_id)
+            if unconfirmed and self.confirm_landed_reply(account_id, target, unconfirmed):
+                success = True
+                break
+            record = {}
+            if self.post_reply(account_id, target, record):
+                success = True
+                break
+            unconfirmed = record if record.get('submitted') else None
+            if attempt < attempts:
+                self.logger.warning(f"账户 {account_id} 目标 {target['id']} 第 {attempt} 次回复失败，{retry_delay} 秒后重试")
+                if not self.sleep_while_running(retry_delay):
+                    break
+        
+        self.state_store.record_attempt(account_id, target['id'], success)
+        return success
+    
+    def confirm_landed_reply(self, account_id, target, record):
+        """
+        重新加载帖子最后一页，查找该账户内容与上次提交相同的帖子
+        
+        该账户会反复回复同一个帖子，所以只接受 pid 大于该目标上次成功回复的帖子，
+        并且正文必须包含上次提交的内容（忽略空白）。
+        
+        Args:
+            record: 未确认的回复记录（message 为上次提交的内容）
+        
+        Returns:
+            找到时记录为成功回复并返回 True；没有找到或无法检查时返回 False
+        """
+        username = self.account_usernames.get(account_id)
+        driver = self.drivers.get(account_id)
+        expected = ''.join((record['message'] or '').split())
+        if not username or not driver or not expected:
+            return False
+        previous_pid = int(self.state_store.get_last_post_id(account_id, target['id']) or 0)
+        
+        tid = target.get('tid') or discuz_api.parse_thread_id(target['url'])
+        url = discuz_api.thread_last_page_url(self.config['forum']['base_url'], tid) if tid else target['url']
+        with self.get_account_lock(account_id):
+            with self.command_metrics.phase(account_id, 'reply'), \
+                    self.watchdog.watch(account_id, self.get_operation_timeout(), '确认回复'):
+                try:
+                    self.activate_account_window(account_id)
+                    self.navigate(account_id, driver, url)
+                    posts = driver.execute_script(AUTHOR_POSTS_SCRIPT, username) or []
+                except Exception as e:
+                    self.logger.warning(f"账户 {account_id} 检查上次提交的回复失败: {e}")
+                    return False
+        
+        landed = [int(pid) for pid, text in posts
+                  if int(pid) > previous_pid and expected in ''.join((text or '').split())]
+        if not landed:
+            self.logger.info(f"账户 {account_id} 上次提交的回复未发布，重新提交")
+            return False
+        
+        post_id = str(max(landed))
+        total = self.record_reply(account_id, post_id)
+        self.state_store.record_reply(account_id, target['id'], True, record['message'], post_id, None)
+        self.logger.info(f"账户 {account_id} 上次提交的回复已发布 #{total} (pid: {post_id})，不再重新提交")
+        return True
+    
+    def sleep_while_running(self, seconds):
+        """可中断的等待，返回 False 表示需要停止"""
+        for _ in range(int(seconds)):
+            if not self.running:
+                return False
+            time.sleep(1)
+        return self.running
+    
+    def get_initial_delay(self, account_id, target):
+        """
+        根据持久化的调度状态计算目标的首次回复延迟
         
-        # 替换时间戳占位符
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        message = content.replace('{timestamp}', timestamp)
+        从未回复过的目标使用 start_delay_seconds；否则从上次尝试时间起继续计算间隔，
+        上次失败时按 retry_delay_seconds 计算，重启后既不会立即连发也不会丢失进度。
+        """
+        state = self.state_store.get_target_state(account_id, target['id'])
+        if not state or not state['last_attempt_at']:
+            return target.get('start_delay_seconds', 0)
         
-        return message
+        if state['consecutive_failures'] > 0:
+            wait_seconds = self.get_retry_policy()[1]
+        else:
+            wait_seconds = target['interval_seconds']
+        return max(0, int(state['last_attempt_at'] + wait_seconds - time.time()))
     
+    def post_reply(self, account_id, target, attempt=None):
+        """
+        发布回复，并把结果追加到回复日志
+        
+        Args:
+            attempt: 可选，用于接收本次回复的记录（message、post_id、error，
+                以及是否已点击提交 submitted，已提交但未确认成功时重试前会先检查回复是否已发布）
+        """
+        if attempt is None:
+            attempt = {}
+        attempt.update({'message': None, 'post_id': None, 'error': None, 'submitted': False})
+        started = time.monotonic()
+        success = False
+        try:
+            with self.get_account_lock(account_id):
+                self.check_driver_recycle(account_id)
+                # 等待账户锁和回收浏览器的时间不计入回复预算
+                deadline = Deadline(self.get_reply_budget())
+                network_capture = self.use_network_capture()
+                if network_capture:
+                    self.read_network_log(account_id)  # 丢弃本次回复之前的事件
+                with self.command_metrics.phase(account_id, 'reply'), \
+                        self.watchdog.watch(account_id, self.get_operation_timeout(), '发布回复'):
+                    self.activate_account_window(account_id)
+                    success = self._post_reply(account_id, target, attempt, deadline)
+                if network_capture:
+                    self.record_network_capture(account_id, self.read_network_log(account_id))
+            return success
+        finally:
+            # 失败次数只在这里统计，与回复日志一致
+            if not success:
+                self.record_failure(account_id)
+            latency_ms = (time.monotonic() - started) * 1000
+            self.state_store.record_reply(
+                account_id, target['id'], success,
+                attempt['message'], attempt['post_id'], latency_ms, attempt['error']
+            )
     
-    def post_reply(self, account_id, target):
-        """发布回复"""
+    def _post_reply(self, account_id, target, attempt, deadline):
+        """
+        发布回复
+        
+        Args:
+            attempt: 本次回复的记录，写入 message、post_id 和 error 供回复日志使用
+            deadline: 本次回复的截止时间，各阶段据此缩短等待或放弃
+        """
         driver = self.drivers.get(account_id)
         if not driver:
+            attempt['error'] = '浏览器驱动不存在'
             self.logger.error(f"账户 {account_id} 浏览器驱动不存在")
             return False
         
+        if self.get_reply_mode() == 'ajax':
+            return self._post_reply_ajax(account_id, driver, target, attempt, deadline)
+        
+        from selenium.webdriver.common.by import By
+        
         try:
-            # 访问目标帖子
-            self.logger.info(f"账户 {account_id} 访问目标帖子: {target['url']}")
-            driver.get(target['url'])
-            time.sleep(2)
+            # 访问目标帖子（常驻标签页已加载过该帖子时直接复用，回复框仍在页面上）
+            warm_tab = self.use_persistent_tabs() and self.switch_to_target_tab(account_id, driver, target)
+            if not warm_tab:
+                self.logger.info(f"账户 {account_id} 访问目标帖子: {target['url']}")
+                self.navigate(account_id, driver, target['url'], deadline)
+                deadline.sleep(2)
             
             # 生成回复消息
-            message = self.get_reply_message(target)
+            message = self.get_reply_message(target, account_id, deadline)
+            attempt['message'] = message
             
-            # 查找快速回复框
+            # 查找回复框（优先使用该论坛上次命中的选择器）
+            textarea_selectors = [
+                (By.ID, "fastpostmessage"),
+                (By.CSS_SELECTOR, "textarea[name='message']")
+            ]
+            reply_textarea = self.find_element_cached(driver, 'reply_textarea', textarea_selectors)
+            if not reply_textarea and warm_tab:
+                # 常驻标签页的页面可能已失效（如被论坛跳转），重新访问帖子
+                self.logger.info(f"账户 {account_id} 常驻标签页中未找到回复框，重新访问目标帖子")
+                self.navigate(account_id, driver, target['url'], deadline)
+                deadline.sleep(2)
+                reply_textarea = self.find_element_cached(driver, 'reply_textarea', textarea_selectors)
+            if not reply_textarea:
+                attempt['error'] = '未找到回复框'
+                self.logger.error(f"账户 {account_id} 未找到回复框")
+                return False
+            
+            self.fill_textarea(driver, reply_textarea, message)
+            
+            # 点击回复按钮
+            button_selectors = [
+                (By.ID, "fastpostsubmit"),
+                (By.CSS_SELECTOR, "button[type='submit']")
+            ]
+            reply_button = self.find_element_cached(driver, 'reply_button', button_selectors)
+            if not reply_button:
+                attempt['error'] = '未找到回复按钮'
+                self.logger.error(f"账户 {account_id} 未找到回复按钮")
+                return False
+            
+            last_pid_before = self.get_last_post(driver)[0]
+            url_before = driver.current_url
+            deadline.require(MIN_SUBMIT_SECONDS, '提交回复')
+            reply_button.click()
+            attempt['submitted'] = True
+            
+            # 确认新回复已出现，并获取其 pid
+            post_id = self.verify_reply(driver, account_id, last_pid_before, deadline, url_before)
+            if not post_id:
+                attempt['error'] = '提交回复后未检测到新帖子'
+                self.logger.error(f"账户 {account_id} 提交回复后未检测到新帖子")
+                self.forget_selectors(account_id, ['reply_textarea', 'reply_button'])
+                return False
+            
+            attempt['post_id'] = post_id
+            # 更新统计信息
+            total = self.record_reply(account_id, post_id)
+            self.logger.info(f"账户 {account_id} 成功发布回复 #{total} (pid: {post_id}): {message}")
+            return True
+            
+        except Exception as e:
+            attempt['error'] = str(e)
+            self.logger.error(f"账户 {account_id} 发布回复失败: {e}")
+            return False
+    
+    def fill_textarea(self, driver, element, text):
+        """
+        填写文本框
+        
+        默认（browser.fill_mode 为 script）用一次脚本调用设置内容，脚本失败或内容不一致时
+        回退到 send_keys；send_keys 会为每个字符发送一次按键事件，长文本较慢。
+        """
+        if self.config.get('browser', {}).get('fill_mode', 'script') == 'script':
             try:
-                reply_textarea = driver.find_element(By.ID, "fastpostmessage")
-                reply_textarea.clear()
-                reply_textarea.send_keys(message)
-                
-                # 点击快速回复按钮
-                reply_button = driver.find_element(By.ID, "fastpostsubmit")
-                reply_button.click()
-                
-                time.sleep(2)
-                
-                # 更新统计信息
-                if account_id not in self.reply_stats:
-                    self.reply_stats[account_id] = {
-                        'total_replies': 0,
-                        'last_reply_time': None,
-                        'start_time': datetime.now()
-                    }
-                
-                self.reply_stats[account_id]['total_replies'] += 1
-                self.reply_stats[account_id]['last_reply_time'] = datetime.now()
-                
-                self.logger.info(f"账户 {account_id} 成功发布回复 #{self.reply_stats[account_id]['total_replies']}: {message}")
-                return True
-                
-            except NoSuchElementException:
-                self.logger.warning(f"账户 {account_id} 未找到快速回复框，尝试其他方式")
-                # 尝试查找其他可能的回复框
-                try:
-                    # 尝试查找普通回复框
-                    reply_textarea = driver.find_element(By.CSS_SELECTOR, "textarea[name='message']")
-                    reply_textarea.clear()
-                    reply_textarea.send_keys(message)
-                    
-                    # 查找提交按钮
-                    submit_button = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
-                    submit_button.click()
-                    
-                    time.sleep(2)
-                    
-                    # 更新统计信息
-                    if account_id not in self.reply_stats:
-                        self.reply_stats[account_id] = {
-                            'total_replies': 0,
-                            'last_reply_time': None,
-                            'start_time': datetime.now()
-                        }
-                    
-                    self.reply_stats[account_id]['total_replies'] += 1
-                    self.reply_stats[account_id]['last_reply_time'] = datetime.now()
-                    
-                    self.logger.info(f"账户 {account_id} 成功发布回复 #{self.reply_stats[account_id]['total_replies']} (备用方法): {message}")
-                    return True
-                    
-                except NoSuchElementException:
-                    self.logger.error(f"账户 {account_id} 未找到回复框")
-                    return False
-                
+                if driver.execute_script(FILL_TEXTAREA_SCRIPT, element, text):
+                    return
+                self.logger.warning("脚本填写后内容不一致，改用逐字输入")
+            except Exception as e:
+                self.logger.warning(f"脚本填写失败，改用逐字输入: {e}")
+        
+        element.clear()
+        element.send_keys(text)
+    
+    def use_persistent_tabs(self):
+        """是否为每个目标保留常驻标签页"""
+        return self.config.get('browser', {}).get('persistent_tabs', False)
+    
+    def switch_to_target_tab(self, account_id, driver, target):
+        """
+        切换到目标的常驻标签页，没有时新开一个（超过上限时关闭最久未使用的标签页）
+        
+        Returns:
+            该标签页是否已加载过目标帖子（False 表示调用方需要访问帖子）
+        """
+        tabs = self.target_tabs.setdefault(account_id, OrderedDict())
+        target_id = target['id']
+        handles = driver.window_handles
+        
+        handle = tabs.get(target_id)
+        if handle in handles:
+            tabs.move_to_end(target_id)
+            driver.switch_to.window(handle)
+            return True
+        tabs.pop(target_id, None)
+        
+        context_id = self.browser_contexts.get(account_id)
+        if not tabs and context_id is None:
+            # 第一个目标直接使用登录时的标签页（共享浏览器模式下主标签页保留给登录和 AJAX 回复）
+            tabs[target_id] = driver.current_window_handle
+            return False
+        
+        if context_id is not None:
+            # 新标签页必须开在账户自己的浏览器上下文中，才能使用该账户的 cookie
+            new_handle = self.open_context_tab(driver, context_id)
+        else:
+            driver.switch_to.new_window('tab')
+            new_handle = driver.current_window_handle
+        
+        max_tabs = max(1, self.config.get('browser', {}).get('max_tabs_per_account', 5))
+        while len(tabs) >= max_tabs:
+            old_target_id, old_handle = tabs.popitem(last=False)
+            if old_handle in handles:
+                driver.switch_to.window(old_handle)
+                driver.close()
+                self.logger.info(f"账户 {account_id} 关闭目标 {old_target_id} 的标签页")
+        driver.switch_to.window(new_handle)
+        
+        tabs[target_id] = new_handle
+        return False
+    
+    def get_ajax_context(self, account_id, driver, target, deadline=None):
+        """
+        获取账户的 formhash 和页面编码（按账户缓存）
+        
+        优先从当前页面读取（登录后浏览器通常已停留在论坛页面），
+        读取不到时才访问一次目标帖子。
+        
+        Returns:
+            (formhash, 页面编码)，未找到 formhash 时返回 None
+        """
+        context = self.ajax_contexts.get(account_id)
+        if context:
+            return context
+        
+        # 同源 fetch 才会带上登录 cookie，浏览器需要停留在论坛域名下
+        if driver.current_url.startswith(self.config['forum']['base_url']):
+            formhash, charset = driver.execute_script(AJAX_CONTEXT_SCRIPT)
+        else:
+            formhash = None
+        
+        if not formhash:
+            self.logger.info(f"账户 {account_id} 当前页面没有 formhash，访问目标帖子: {target['url']}")
+            self.navigate(account_id, driver, target['url'], deadline)
+            formhash, charset = driver.execute_script(AJAX_CONTEXT_SCRIPT)
+            if not formhash:
+                return None
+        
+        context = (formhash, charset or 'utf-8')
+        self.ajax_contexts[account_id] = context
+        return context
+    
+    def _post_reply_ajax(self, account_id, driver, target, attempt, deadline):
+        """
+        在页面内直接提交快速回复请求（inajax=1），不加载帖子页面
+        
+        一次回复只发送一个小请求并读取简短的 AJAX 响应，从响应中确认结果并解析 pid。
+        """
+        try:
+            tid = target.get('tid') or discuz_api.parse_thread_id(target['url'])
+            if not tid:
+                attempt['error'] = '无法从链接中解析帖子 tid'
+                self.logger.error(f"账户 {account_id} 无法从链接中解析帖子 tid: {target['url']}")
+                return False
+            
+            context = self.get_ajax_context(account_id, driver, target, deadline)
+            if not context:
+                attempt['error'] = '未找到 formhash'
+                self.logger.error(f"账户 {account_id} 未找到 formhash")
+                return False
+            formhash, charset = context
+            
+            # 生成回复消息
+            message = self.get_reply_message(target, account_id, deadline)
+            attempt['message'] = message
+            
+            deadline.require(MIN_SUBMIT_SECONDS, '提交回复')
+            url = discuz_api.reply_submit_url(self.config['forum']['base_url'], tid, target.get('fid'))
+            body = urlencode(discuz_api.reply_form_data(message, formhash, charset))
+            ok, text = self.execute_async_script(driver, deadline, AJAX_REPLY_SCRIPT, url, body)
+            
+            if not ok or not discuz_api.is_reply_success(text):
+                # formhash 可能已失效，下次重新读取
+                self.ajax_contexts.pop(account_id, None)
+                attempt['error'] = discuz_api.parse_ajax_message(text)
+                self.logger.error(f"账户 {account_id} 发布回复失败: {attempt['error']}")
+                return False
+            
+            post_id = discuz_api.parse_post_id(text)
+            attempt['post_id'] = post_id
+            total = self.record_reply(account_id, post_id)
+            self.logger.info(f"账户 {account_id} 成功发布回复 #{total} (pid: {post_id}): {message}")
+            return True
+            
         except Exception as e:
+            attempt['error'] = str(e)
             self.logger.error(f"账户 {account_id} 发布回复失败: {e}")
             return False
     
+    def get_stats_snapshot(self):
+        """获取回复统计的快照"""
+        with self.stats_lock:
+            snapshot = {account_id: dict(stats) for account_id, stats in self.reply_stats.items()}
+        
+        # 附上 WebDriver 命令统计：{阶段: 统计}
+        for (account_id, phase), stats in self.command_metrics.snapshot().items():
+            if account_id in snapshot:
+                snapshot[account_id].setdefault('webdriver', {})[phase] = stats
+        
+        # 附上网络耗时统计
+        for account_id, stats in self.network_metrics.snapshot().items():
+            if account_id in snapshot:
+                snapshot[account_id]['network'] = stats
+        return snapshot
+    
+    def log_driver_stats(self):
+        """把 WebDriver 命令统计和网络耗时统计写入日志"""
+        snapshot = self.command_metrics.snapshot()
+        for (account_id, phase), stats in sorted(snapshot.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            if not stats['commands']:
+                continue
+            self.logger.info(
+                f"WebDriver 命令统计 - 账户 {account_id or '-'} {format_phase_stats(phase, stats)}"
+                f"（共 {stats['commands']} 条 / {stats['wire_seconds']:.2f} 秒；"
+                f"耗时最多: {format_top_commands(stats)}）"
+            )
+        
+        for account_id, stats in sorted(self.network_metrics.snapshot().items()):
+            self.logger.info(f"网络统计 - 账户 {account_id} {format_network_stats(stats)}")
+    
+    def stop(self):
+        """请求停止所有回复任务"""
+        self.running = False
+        self.watchdog.stop()
+    
     def display_stats(self):
         """显示统计信息"""
+        if not self.show_stats:
+            return
+        
         os.system('cls' if os.name == 'nt' else 'clear')
         
         print("=" * 120)
@@ -455,10 +1371,20 @@ class TimedReplyBot:
             stats = self.reply_stats.get(account_id, {})
             
             print(f"\n👤 账户: {username} ({account_id})")
-            print(f"📊 总回复数: {stats.get('total_replies', 0)}")
+            print(f"📊 总回复数: {stats.get('total_replies', 0)}  ❌ 失败: {stats.get('failed_replies', 0)}")
             
             if stats.get('last_reply_time'):
-                print(f"🕐 最后回复: {stats['last_reply_time'].strftime('%Y-%m-%d %H:%M:%S')}")
+                print(f"🕐 最后回复: {stats['last_reply_time'].strftime('%Y-%m-%d %H:%M:%S')} (pid: {stats.get('last_post_id') or '未知'})")
+            
+            command_stats = self.command_metrics.snapshot(account_id)
+            if command_stats:
+                phases = [format_phase_stats(phase, command_stats[(account_id, phase)])
+                          for _, phase in sorted(command_stats)]
+                print(f"🔌 WebDriver: {'；'.join(phases)}")
+            
+            network_stats = self.network_metrics.snapshot(account_id).get(account_id)
+            if network_stats:
+                print(f"🌐 网络: {format_network_stats(network_stats)}")
             
             # 显示该账户的回复目标
             targets = self.config_manager.get_enabled_targets(account)
@@ -491,7 +1417,8 @@ class TimedReplyBot:
                 # 显示模板概要（仅当笑话生成禁用时显示）
                 if not joke_config.get('enabled', False):
                     templates = target.get('reply_templates', [])
-                    print(f"     📝 模板概要 ({len(templates)}个，随机选择):")
+                    policy = target.get('template_policy', 'round_robin')
+                    print(f"     📝 模板概要 ({len(templates)}个，轮换策略: {policy}):")
                     
                     for i, template in enumerate(templates):
                         # 处理模板格式
@@ -515,7 +1442,7 @@ class TimedReplyBot:
         account_id = account['id']
         target_id = target['id']
         interval_seconds = target['interval_seconds']
-        start_delay = target.get('start_delay_seconds', 0)
+        start_delay = self.get_initial_delay(account_id, target)
         
         self.logger.info(f"启动账户 {account_id} 的目标 {target_id}，间隔 {interval_seconds} 秒，延迟 {start_delay} 秒")
         
@@ -537,7 +1464,7 @@ class TimedReplyBot:
         while self.running:
             try:
                 # 发布回复
-                success = self.post_reply(account_id, target)
+                success = self.post_reply_with_retry(account_id, target)
                 if not success:
                     self.logger.error(f"账户 {account_id} 目标 {target_id} 回复失败")
                 
@@ -574,6 +1501,12 @@ class TimedReplyBot:
         
         self.running = True
         
+        # 异步 HTTP 引擎：所有账户和目标在同一个事件循环上运行
+        if self.get_engine_type() == 'async_http':
+            from async_reply import AsyncReplyEngine
+            AsyncReplyEngine(self).run()
+            return
+        
         # 获取启用的账户
         enabled_accounts = self.config_manager.get_enabled_accounts()
         if not enabled_accounts:
@@ -638,9 +1571,112 @@ class TimedReplyBot:
         finally:
             self.close_all_drivers()
     
+    def run_once(self):
+        """
+        单次运行：每个账户登录一次，对每个启用的目标各回复一次后退出
+        
+        账户之间并发执行（最多 max_concurrent_accounts 个），同一账户的目标依次回复，
+        避免共用一个浏览器驱动并触发论坛的发帖间隔限制。不检查工作时间，由外部调度器决定何时运行。
+        
+        Returns:
+            回复结果列表 [(account_id, target_id, 是否成功), ...]
+        """
+        self.logger.info("启动单次回复任务")
+        self.running = True
+        start_time = time.monotonic()
+        
+        if self.get_engine_type() == 'async_http':
+            from async_reply import AsyncReplyEngine
+            results = AsyncReplyEngine(self).run_once()
+        else:
+            enabled_accounts = self.config_manager.get_enabled_accounts()
+            max_workers = self.config.get('global_settings', {}).get('max_concurrent_accounts', 3)
+            results = []
+            try:
+                if enabled_accounts:
+                    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                        try:
+                            for account_results in executor.map(self.run_account_once, enabled_accounts):
+                                results.extend(account_results)
+                        except KeyboardInterrupt:
+                            # 取消尚未开始的账户，正在运行的账户跳过剩余目标
+                            self.stop()
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            self.report_interrupted_once(enabled_accounts, results)
+                            raise
+            finally:
+                self.close_all_drivers()
+        
+        self.running = False
+        self.report_once_results(results, time.monotonic() - start_time)
+        return results
+    
+    def run_account_once(self, account):
+        """登录单个账户并对其每个启用的目标回复一次"""
+        account_id = account['id']
+        targets = self.config_manager.get_enabled_targets(account)
+        if not targets:
+            return []
+        
+        if not self.login(account):
+            self.logger.error(f"账户 {account_id} 登录失败，跳过 {len(targets)} 个目标")
+            return [(account_id, target['id'], False) for target in targets]
+        
+        results = []
+        for target in targets:
+            if not self.running:
+                results.append((account_id, target['id'], False))
+                continue
+            success = self.post_reply_with_retry(account_id, target)
+            results.append((account_id, target['id'], success))
+        return results
+    
+    def report_interrupted_once(self, accounts, results):
+        """单次运行被中断时输出未完成的目标"""
+        finished = {(account_id, target_id) for account_id, target_id, _ in results}
+        unfinished = [
+            f"{account['id']} -> {target['id']}"
+            for account in accounts
+            for target in self.config_manager.get_enabled_targets(account)
+            if (account['id'], target['id']) not in finished
+        ]
+        self.logger.warning(f"单次运行被中断，{len(unfinished)} 个目标未完成: {', '.join(unfinished)}")
+    
+    def report_once_results(self, results, elapsed):
+        """输出单次运行的汇总"""
+        succeeded = sum(1 for _, _, success in results if success)
+        failed = len(results) - succeeded
+        
+        print("\n" + "=" * 50)
+        print(f"🤖 单次运行完成，耗时 {elapsed:.1f} 秒")
+        for account_id, target_id, success in results:
+            print(f"  {'✅' if success else '❌'} {account_id} -> {target_id}")
+        print(f"📊 成功: {succeeded}  失败: {failed}")
+        print("=" * 50)
+        
+        self.logger.info(f"单次运行完成: 成功 {succeeded}，失败 {failed}，耗时 {elapsed:.1f} 秒")
+    
     def close_all_drivers(self):
         """关闭所有浏览器驱动"""
+        self.watchdog.stop()
+        self.log_driver_stats()
+        self.logged_in_accounts.clear()
+        self.target_tabs.clear()
+        
+        shared_driver = self.shared_driver
+        if shared_driver is not None:
+            try:
+                shared_driver.quit()
+                self.logger.info(f"共享浏览器已关闭（{len(self.browser_contexts)} 个账户）")
+            except Exception as e:
+                self.logger.error(f"关闭共享浏览器时出错: {e}")
+            self.shared_driver = None
+            self.browser_contexts.clear()
+            self.account_windows.clear()
+        
         for account_id, driver in self.drivers.items():
+            if driver is shared_driver:
+                continue
             try:
                 driver.quit()
                 self.logger.info(f"账户 {account_id} 浏览器已关闭")
@@ -0,0 +1,163 @@
+"""
+多进程分片运行 - 按账户 ID 的稳定哈希把账户分配到多个工作进程
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+from timed_reply import ConfigManager, TimedReplyBot, account_shard
+
+STATS_REPORT_INTERVAL = 5
+
+
+def _worker_main(config_file, shard_index, shard_count, stats_queue, stop_event, once):
+    """工作进程入口：只运行属于本分片的账户"""
+    # 终端的 Ctrl+C 由父进程统一处理后通过 stop_event 转发
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    config_manager = ConfigManager(config_file)
+    config_manager.set_shard(shard_index, shard_count)
+
+    bot = TimedReplyBot(config_manager)
+    bot.show_stats = False
+    signal.signal(signal.SIGTERM, lambda signum, frame: bot.stop())
+
+    def report_stats():
+        while not stop_event.wait(STATS_REPORT_INTERVAL):
+            stats_queue.put((shard_index, bot.get_stats_snapshot()))
+        bot.stop()
+
+    reporter = threading.Thread(target=report_stats, name=f"stats_reporter_{shard_index}")
+    reporter.daemon = True
+    reporter.start()
+
+    try:
+        if once:
+            results = bot.run_once()
+            if not all(success for _, _, success in results):
+                sys.exit(1)
+        else:
+            bot.run_timed_reply()
+    finally:
+        stats_queue.put((shard_index, bot.get_stats_snapshot()))
+
+
+class WorkerPool:
+    def __init__(self, config_file, workers, once=False):
+        """
+        初始化多进程工作池
+
+        Args:
+            config_file: 配置文件路径（每个工作进程独立加载）
+            workers: 工作进程数量
+            once: 是否为单次运行模式
+        """
+        self.config_file = config_file
+        self.workers = workers
+        self.once = once
+        self.config_manager = ConfigManager(config_file)
+
+        context = multiprocessing.get_context('spawn')
+        self.context = context
+        self.stats_queue = context.Queue()
+        self.stop_event = context.Event()
+        self.processes = []
+        self.shard_stats = {}  # 每个分片最近一次上报的统计
+
+    def _forward_signal(self, signum, frame):
+        """把停止信号转发给所有工作进程"""
+        if not self.stop_event.is_set():
+            print(f"\n🤖 收到信号 {signum}，正在通知 {len(self.processes)} 个工作进程停止...")
+        self.stop_event.set()
+
+    def _drain_stats(self, timeout):
+        """接收工作进程上报的统计"""
+        try:
+            shard_index, stats = self.stats_queue.get(timeout=timeout)
+            self.shard_stats[shard_index] = stats
+            while True:
+                shard_index, stats = self.stats_queue.get_nowait()
+                self.shard_stats[shard_index] = stats
+        except queue.Empty:
+            pass
+
+    def get_aggregated_stats(self):
+        """合并所有分片的统计信息"""
+        aggregated = {}
+        for stats in self.shard_stats.values():
+            aggregated.update(stats)
+        return aggregated
+
+    def display_stats(self):
+        """显示所有工作进程的汇总统计"""
+        os.system('cls' if os.name == 'nt' else 'clear')
+
+        aggregated = self.get_aggregated_stats()
+        alive = sum(1 for process in self.processes if process.is_alive())
+
+        print("=" * 120)
+        print(f"🤖 多账户定时回复机器人 - 多进程统计 (工作进程 {alive}/{self.workers})")
+        print("=" * 120)
+
+        for account in self.config_manager.get_enabled_accounts():
+            account_id = account['id']
+            stats = aggregated.get(account_id, {})
+            shard = account_shard(account_id, self.workers)
+            print(f"\n👤 账户: {account['username']} ({account_id}) - 工作进程 #{shard}")
+            print(f"📊 总回复数: {stats.get('total_replies', 0)}")
+            if stats.get('last_reply_time'):
+                print(f"🕐 最后回复: {stats['last_reply_time'].strftime('%Y-%m-%d %H:%M:%S')}")
+
+        total = sum(stats.get('total_replies', 0) for stats in aggregated.values())
+        print(f"\n📈 全部账户总回复数: {total}")
+        print("\n" + "=" * 120)
+        print("按 Ctrl+C 停止机器人")
+        print("=" * 120)
+
+    def run(self):
+        """启动工作进程并等待其结束，返回所有工作进程是否都正常退出"""
+        previous_handlers = {
+            signal.SIGINT: signal.signal(signal.SIGINT, self._forward_signal),
+            signal.SIGTERM: signal.signal(signal.SIGTERM, self._forward_signal),
+        }
+
+        try:
+            for shard_index in range(self.workers):
+                process = self.context.Process(
+                    target=_worker_main,
+                    args=(self.config_file, shard_index, self.workers, self.stats_queue, self.stop_event, self.once),
+                    name=f"reply_worker_{shard_index}"
+                )
+                process.start()
+                self.processes.append(process)
+
+            last_display = 0
+            while any(process.is_alive() for process in self.processes):
+                self._drain_stats(timeout=1)
+                if not self.once and not self.stop_event.is_set() and time.monotonic() - last_display >= 10:
+                    self.display_stats()
+                    last_display = time.monotonic()
+
+            self._drain_stats(timeout=0)
+        finally:
+            self.stop_event.set()
+            for process in self.processes:
+                process.join(timeout=30)
+                if process.is_alive():
+                    process.terminate()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        # 显示最终统计
+        print(f"\n🤖 所有工作进程已停止！({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+        aggregated = self.get_aggregated_stats()
+        for account in self.config_manager.get_enabled_accounts():
+            stats = aggregated.get(account['id'], {})
+            print(f"账户 {account['username']}: 总回复数 {stats.get('total_replies', 0)}")
+
+        return all(process.exitcode == 0 for process in self.processes)